@@ -297,6 +297,10 @@ class FFParameters(db.Model):
     perf_metric = db.Column(db.String(128), nullable=False)
     # contains the GC metrics file loads since the chosen initial_p to the end
     plan_since_initial_p = db.Column(postgresql.ARRAY(Float))
+    # the fitting algorithm of these parameters and the rmse and run time of
+    # every algorithm that was tried
+    fitting_algo = db.Column(db.String(32))
+    fitting_report = db.Column(postgresql.JSON)
     owner_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
 
     def plan_since_initial_p_till_today(self):
@@ -366,6 +370,8 @@ class FFPlan(db.Model):
     off_weeks = db.Column(postgresql.ARRAY(db.Integer))
     off_days = db.Column(postgresql.ARRAY(db.Integer))
     weekly_cycle = db.Column(postgresql.ARRAY(db.Integer), nullable=False)
+    # plan generation was stopped by its time or evaluation budget
+    budget_limited = db.Column(db.Boolean, default=False)
     owner_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
 
     def ui_start_perf(self):
@@ -428,6 +434,10 @@ class PPParameters(db.Model):
     perf_metric = db.Column(db.String(128), nullable=False)
     # contains the GC metrics file loads since the chosen initial_pp to the end
     plan_since_initial_pp = db.Column(postgresql.ARRAY(Float))
+    # the fitting algorithm of these parameters and the rmse and run time of
+    # every algorithm that was tried
+    fitting_algo = db.Column(db.String(32))
+    fitting_report = db.Column(postgresql.JSON)
     owner_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
 
     def unscale_perf_value(self, value):
@@ -502,6 +512,8 @@ class PPPlan(db.Model):
     off_weeks = db.Column(postgresql.ARRAY(db.Integer))
     off_days = db.Column(postgresql.ARRAY(db.Integer))
     weekly_cycle = db.Column(postgresql.ARRAY(db.Integer), nullable=False)
+    # plan generation was stopped by its time or evaluation budget
+    budget_limited = db.Column(db.Boolean, default=False)
     owner_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
 
     def unscale_perf_value(self, value):
@@ -1,7 +1,14 @@
 import cma
 from scipy.optimize import differential_evolution as scipy_de
-from scipy.optimize import minimize
+from scipy.optimize import minimize, OptimizeResult
 import numpy as np
+import time
+
+try:
+    # celery workers are daemonic, only billiard lets them fork a pool
+    import billiard as multiprocessing
+except ImportError:
+    import multiprocessing
 
 WORKLOAD_FACTOR = 0.001
 
@@ -9,15 +16,15 @@ WORKLOAD_FACTOR = 0.001
 def objective_f(loads, *args):
     '''objective function to be minimized'''
     goal = args[0]
-    model_perf_func = args[1]
+    model = args[1]
     model_parameters = args[2]
     training_days = args[3]
     plan_length = args[4]
-    prequel_plan = args[5]
+    prequel_state = args[5]
     pp_func = args[6]
     plan = map_loads_to_training_days(loads, training_days, plan_length)
     plan = pp_func(plan)
-    plan_perf = model_perf_func(prequel_plan + plan, **model_parameters)
+    plan_perf = model.final([plan], model_parameters, prequel_state)[0]
     total_workload = sum(plan)
     fitness_wo_load = abs(goal - plan_perf)
     fitness_with_load = fitness_wo_load + WORKLOAD_FACTOR * total_workload
@@ -31,47 +38,289 @@ def map_loads_to_training_days(loads, training_days, plan_length):
     return plan
 
 
+class BudgetSpent(Exception):
+    '''raised by an objective function to stop an optimizer without a
+    callback to stop it'''
+    pass
+
+
+def budget_callback(time_budget, max_evaluations, evaluations):
+    '''returns a scipy callback which stops the optimization when the
+    time_budget in seconds is over or the evaluations counter, a one element
+    list, exceeds max_evaluations'''
+    deadline = None if time_budget is None else time.time() + time_budget
+
+    def callback(*args, **kwargs):
+        return ((deadline is not None and time.time() >= deadline) or
+                (max_evaluations is not None and
+                 evaluations[0] >= max_evaluations))
+    return callback
+
+
+def objective_batch(loads, goal, model, model_parameters, training_days,
+                    plans, prequel_state, pp_func):
+    '''objective_f() for a (candidates x training days) array of loads,
+    scored with one model call. plans is a preallocated (candidates x days)
+    buffer whose off-days stay 0.0'''
+    plans = plans[:len(loads)]
+    plans[:, training_days] = loads
+    if pp_func is not None:
+        for plan in plans:
+            plan[:] = pp_func(plan)
+    perfs = model.final(plans, model_parameters, prequel_state)
+    return np.abs(goal - perfs) + WORKLOAD_FACTOR * plans.sum(axis=1)
+
+
+# arguments of objective_batch(), inherited by the forked pool processes
+_objective_args = None
+
+
+def _init_objective(args):
+    global _objective_args
+    _objective_args = args
+
+
+def _objective_chunk(loads):
+    goal, model, model_parameters, training_days, plan_length, \
+        prequel_state, pp_func = _objective_args
+    plans = np.zeros((len(loads), plan_length))
+    return objective_batch(loads, goal, model, model_parameters,
+                           training_days, plans, prequel_state, pp_func)
+
+
 def genplan(length,  # in weeks
             goal,
             training_days,
             max_load,
-            model_func,
-            prequel_plan,
+            model,
+            prequel_state,
             pp_func,
+            time_budget=None,   # in seconds
+            max_evaluations=None,
+            stats=None,
+            seed=None,          # warm start plan
+            processes=None,     # score the population in a process pool
+            telemetry=None,     # list to record every generation
+            popsize=None,       # None is the cma default 4 + 3 * ln(days)
+            sigma=None,         # initial step size, None is max_load / 4
+            evaluation_counter=None,    # shared with concurrent runs
             **model_parameters):
-    '''generate a plan with cma.fmin'''
-    x0 = [0.0] * len(training_days)
+    '''generate a plan with an ask and tell CMA-ES loop, every generation is
+    scored with one batched model call. model is a model module like
+    fitnessfatigue, its final() continues the plan from prequel_state. when
+    the time_budget or max_evaluations run out, the best plan so far is
+    returned and, if stats is a dict, stats['budget_limited'] is set. a seed
+    plan becomes the initial mean instead of all zero loads. if telemetry is
+    a list, a dict with the iteration, evaluations, best and median
+    objective, step size sigma and run time of every generation is appended
+    to it. an evaluation_counter multiprocessing.Value makes concurrent
+    runs share the max_evaluations budget'''
+    if seed is None:
+        x0 = [0.0] * len(training_days)
+    else:
+        x0 = [seed[i] for i in training_days]
     options = cma.CMAOptions()
     options.set('bounds', [0.0, max_load])
+    if max_evaluations is not None and evaluation_counter is None:
+        options.set('maxfevals', max_evaluations)
+    if popsize is not None:
+        options.set('popsize', popsize)
+    # cma reseeds numpy, draw its seed from the caller's random state
+    options.set('seed', np.random.randint(1, 2 ** 31 - 1))
     # options.set('verb_disp', 0)
     # options.set('verbose', -9)
     # options.set('verb_log', 0)
     # options.set('maxiter', 800)
-    args = (goal, model_func, model_parameters, training_days, length * 7,
-            prequel_plan, pp_func)
+    plan_length = length * 7
+    training_days = np.asarray(training_days, dtype=int)
+    args = (goal, model, model_parameters, training_days, plan_length,
+            prequel_state, pp_func)
     print('max_load {}'.format(max_load))
-    sigma = max_load / 4
-    solution = cma.fmin(objective_f, x0, sigma, args=args, options=options)
-    plan = map_loads_to_training_days(solution[0], training_days, length * 7)
-    return plan
+    if sigma is None:
+        sigma = max_load / 4
+    es = cma.CMAEvolutionStrategy(x0, sigma, options)
+    plans = np.zeros((es.popsize, plan_length))
+    pool = None
+    if processes is not None:
+        pool = multiprocessing.Pool(processes, _init_objective, (args,))
+    start_time = time.time()
+    shared_budget_spent = False
+    timed_out = False
+    try:
+        while not es.stop() and not shared_budget_spent and not timed_out:
+            xs = es.ask()
+            if pool is None:
+                f = objective_batch(np.array(xs), goal, model,
+                                    model_parameters, training_days, plans,
+                                    prequel_state, pp_func)
+            else:
+                f = np.concatenate(pool.map(_objective_chunk,
+                                            np.array_split(np.array(xs),
+                                                           processes)))
+            es.tell(xs, list(f))
+            es.disp()
+            if evaluation_counter is not None:
+                with evaluation_counter.get_lock():
+                    evaluation_counter.value += len(xs)
+                    shared_budget_spent = (
+                        max_evaluations is not None and
+                        evaluation_counter.value >= max_evaluations)
+            timed_out = (time_budget is not None and
+                         time.time() - start_time >= time_budget)
+            if telemetry is not None:
+                telemetry.append({'iteration': es.countiter,
+                                  'evaluations': es.countevals,
+                                  'best': np.min(f),
+                                  'median': np.median(f),
+                                  'sigma': es.sigma,
+                                  'run_time': time.time() - start_time})
+    finally:
+        if pool is not None:
+            pool.terminate()
+    stop = es.stop()
+    if stats is not None:
+        stats['evaluations'] = es.countevals
+        stats['budget_limited'] = (timed_out or
+                                   'maxfevals' in stop or
+                                   shared_budget_spent)
+        stats['objective'] = es.best.f
+    plan = np.zeros(plan_length)
+    plan[training_days] = es.best.x
+    if pp_func is not None:
+        plan = pp_func(plan)    # the plan as it was scored
+    return list(plan)
+
+
+RESTART_REGIMES = ['ipop', 'bipop']
+
+
+def restart_schedule(restarts, regime, days, sigma):
+    '''returns the (popsize, sigma) of every restart. ipop doubles the
+    population size from run to run. bipop interleaves these large
+    populations with small ones that take small steps, each small run draws
+    its popsize and sigma at random like in Hansen's BIPOP-CMA-ES'''
+    if regime not in RESTART_REGIMES:
+        raise ValueError('unknown restart regime {}'.format(regime))
+    default = 4 + int(3 * np.log(days))
+    if regime == 'ipop':
+        return [(default * 2 ** i, sigma) for i in range(restarts)]
+    schedule = []
+    for i in range(restarts):
+        large = default * 2 ** (i // 2)
+        if i % 2 == 0:
+            schedule.append((large, sigma))
+        else:
+            u_f = np.random.uniform()
+            popsize = int(default * (0.5 * large / default) ** (u_f ** 2))
+            schedule.append((max(popsize, 2),
+                             sigma * 10 ** (-2 * np.random.uniform())))
+    return schedule
+
+
+# arguments of the restarts, inherited by the forked pool processes
+_restart_args = None
+
+
+def _init_restart(args, kwargs, evaluation_counter, deadline):
+    global _restart_args
+    _restart_args = (args, kwargs, evaluation_counter, deadline)
+    np.random.seed()    # forked processes share the parent's random state
+
+
+def _restart(run):
+    i, (popsize, sigma) = run
+    args, kwargs, evaluation_counter, deadline = _restart_args
+    kwargs = dict(kwargs)
+    if deadline is not None:
+        kwargs['time_budget'] = deadline - time.time()
+        if kwargs['time_budget'] <= 0:
+            return None
+    length, training_days, max_load = args[0], args[2], args[3]
+    if i > 0 or kwargs.get('seed') is None:
+        # only the first run starts from the seed or all zero loads
+        seed = [0.0] * (length * 7)
+        if i > 0:
+            for d in training_days:
+                seed[d] = np.random.uniform(0.0, max_load)
+        kwargs['seed'] = seed
+    stats = {}
+    solution = genplan(*args,
+                       stats=stats,
+                       popsize=popsize,
+                       sigma=sigma,
+                       evaluation_counter=evaluation_counter,
+                       **kwargs)
+    return solution, stats
+
+
+def genplan_restarts(restarts, regime, *args, **kwargs):
+    '''runs genplan restarts times with the population sizes and step
+    sizes of the ipop or bipop restart_schedule, concurrently in a process
+    pool. args and kwargs are passed on to genplan, its time_budget and
+    max_evaluations are shared by all runs. returns the plan with the lowest
+    objective and the stats of its run. if the time_budget runs out before
+    any run starts, the seed or all zero plan is returned as budget
+    limited'''
+    time_budget = kwargs.pop('time_budget', None)
+    deadline = None if time_budget is None else time.time() + time_budget
+    days = len(args[2])
+    sigma = kwargs.pop('sigma', None)
+    if sigma is None:
+        sigma = args[3] / 4
+    schedule = restart_schedule(restarts, regime, days, sigma)
+    evaluation_counter = multiprocessing.Value('l', 0)
+    pool = multiprocessing.Pool(restarts,
+                                _init_restart,
+                                (args, kwargs, evaluation_counter, deadline))
+    best = None
+    try:
+        for result in pool.imap_unordered(_restart, enumerate(schedule)):
+            if result is None:
+                continue
+            if best is None or result[1]['objective'] < best[1]['objective']:
+                best = result
+    finally:
+        pool.terminate()
+    if best is None:
+        seed = kwargs.get('seed')
+        plan = [0.0] * (args[0] * 7) if seed is None else list(seed)
+        best = plan, {'budget_limited': True, 'objective': None}
+    best[1]['evaluations'] = evaluation_counter.value
+    return best
 
 
 def genplan_de(length,  # in weeks
                goal,
                training_days,
                max_load,
-               model_func,
-               prequel_plan,
+               model,
+               prequel_state,
                pp_func,
+               time_budget=None,    # in seconds
+               max_evaluations=None,
+               stats=None,
                **model_parameters):
     bounds = [(0, max_load)] * len(training_days)
-    args = (goal, model_func, model_parameters, training_days, length * 7,
-            prequel_plan, pp_func)
-    solution = scipy_de(objective_f,
+    args = (goal, model, model_parameters, training_days, length * 7,
+            prequel_state, pp_func)
+    evaluations = [0]
+
+    def counted_objective_f(loads, *args):
+        evaluations[0] += 1
+        return objective_f(loads, *args)
+
+    callback = budget_callback(time_budget, max_evaluations, evaluations)
+    solution = scipy_de(counted_objective_f,
                         bounds, args=args,
                         mutation=(1, 1.99),
                         recombination=0.5,
+                        callback=callback,
+                        # polishing would overrun the budget
+                        polish=time_budget is None and max_evaluations is None,
                         disp=True)
+    if stats is not None:
+        stats['evaluations'] = evaluations[0]
+        stats['budget_limited'] = bool(callback())
     solution.x = pp_func(solution.x)
     plan = map_loads_to_training_days(solution.x, training_days, length * 7)
     return plan
@@ -81,24 +330,52 @@ def genplan_minimize(length,  # in weeks
                      goal,
                      training_days,
                      max_load,
-                     model_func,
-                     prequel_plan,
+                     model,
+                     prequel_state,
                      pp_func,
+                     time_budget=None,    # in seconds
+                     max_evaluations=None,
+                     stats=None,
                      **model_parameters):
     x0 = np.array([0.0] * len(training_days))  # initial guess
-    args = (goal, model_func, model_parameters, training_days, length * 7,
-            prequel_plan, pp_func)
+    args = (goal, model, model_parameters, training_days, length * 7,
+            prequel_state, pp_func)
     bounds = [(0.0, max_load)] * len(training_days)
     options = {'maxiter': 400, 'disp': False}
+    if max_evaluations is not None:
+        options['maxfun'] = max_evaluations
+    evaluations = [0]
+    callback = budget_callback(time_budget, max_evaluations, evaluations)
+    best = {}
+
+    def counted_objective_f(loads, *args):
+        # L-BFGS-B can't be stopped by its callback, the objective stops it
+        if best and callback():
+            raise BudgetSpent()
+        evaluations[0] += 1
+        f = objective_f(loads, *args)
+        if not best or f < best['fun']:
+            best.update(x=np.array(loads), fun=f)
+        return f
 
     def iter_callback(xk):
         print("current parameter vector: {}".format(xk))
 
-    optres = minimize(objective_f,
-                      x0,
-                      args,
-                      'L-BFGS-B',
-                      bounds=bounds,
-                      options=options,
-                      callback=iter_callback)
+    try:
+        optres = minimize(counted_objective_f,
+                          x0,
+                          args,
+                          'L-BFGS-B',
+                          bounds=bounds,
+                          options=options,
+                          callback=iter_callback)
+    except BudgetSpent:
+        optres = OptimizeResult(x=best['x'],
+                                fun=best['fun'],
+                                nfev=evaluations[0],
+                                success=False,
+                                message='budget spent')
+    if stats is not None:
+        stats['evaluations'] = evaluations[0]
+        stats['budget_limited'] = bool(callback())
     return optres
@@ -1,6 +1,12 @@
 import numpy as np
 import time
 
+try:
+    # celery workers are daemonic, only billiard lets them fork a pool
+    import billiard as multiprocessing
+except ImportError:
+    import multiprocessing
+
 try:
     from . import fitnessfatigue as ff_model
     from . import perpot as pp_model
@@ -12,55 +18,147 @@ except SystemError:
 
 POP_SIZE = 50
 GOOD_ENOUGH_THRES = 0.5
+# 'rand' is the classic operator with a random target, 'jade' and 'shade'
+# adapt F and CR from successful trials and mutate current-to-pbest
+STRATEGIES = ['rand', 'jade', 'shade']
+JADE_LEARNING_RATE = 0.1
+JADE_P = 0.1            # share of the best plans to choose pbest from
+ADAPTIVE_SPREAD = 0.1   # scale of the F and CR distributions
+SURROGATE_SAMPLES = 10  # times pop_size evaluated plans the surrogate keeps
 
 
 def de_operator(a, b, c, d, max_load, min_load, recomb_weight, scale_factor):
-    a_p = a.copy()
-    index = np.random.randint(0, len(a_p))
-    for i in range(len(a_p)):
-        if np.random.random() <= recomb_weight or i == index:
-            a_p[i] = b[i] + scale_factor * (c[i] - d[i])
-        if a_p[i] < 0.0 or 0.0 < a_p[i] < min_load:     # don't change off-days
-            a_p[i] = min_load
-        elif a_p[i] > max_load:
-            a_p[i] = max_load
-    return a_p
-
-
-def generate_individual(weeks, off_days, max_load, min_load, pop_init_divisor):
-    """returns a random plan with an upper bound of max_load / pop_init_divisor
-    and a lower bound of min_load"""
-    plan = np.random.random(weeks * 7) * (max_load / pop_init_divisor)
-    for i, v in enumerate(plan):
-        if v < min_load:
-            plan[i] = min_load
-    for i in off_days:
-        plan[i] = 0.0
-    return plan
+    """mutation, binomial crossover and load clamping for a single plan or a
+    whole (pop_size x days) population at once. scale_factor and
+    recomb_weight are scalars or one value per plan"""
+    a = np.asarray(a, dtype=np.double)
+    single = a.ndim == 1
+    a, b, c, d = (np.atleast_2d(np.asarray(x, dtype=np.double))
+                  for x in (a, b, c, d))
+    rows, days = a.shape
+    scale_factor = np.reshape(scale_factor, (-1, 1))
+    recomb_weight = np.reshape(recomb_weight, (-1, 1))
+    crossover = np.random.random((rows, days)) <= recomb_weight
+    crossover[np.arange(rows), np.random.randint(0, days, rows)] = True
+    a_p = np.where(crossover, b + scale_factor * (c - d), a)
+    too_low = (a_p < 0.0) | ((0.0 < a_p) & (a_p < min_load))  # keep off-days
+    too_high = ~too_low & (a_p > max_load)
+    a_p[too_low] = min_load
+    a_p[too_high] = max_load
+    return a_p[0] if single else a_p
+
+
+def random_distinct_indices(pop_size, k, exclude_self=False):
+    """returns k distinct random indices below pop_size for every plan of the
+    population as a (pop_size x k) array. with exclude_self the row index
+    itself is never chosen"""
+    r = np.random.random((pop_size, pop_size))
+    if exclude_self:
+        np.fill_diagonal(r, 2.0)    # sorts last
+    return r.argsort(axis=1)[:, :k]
+
+
+def sample_adaptive_parameters(memory_f, memory_cr, pop_size):
+    """draws F from a Cauchy and CR from a normal distribution around a
+    random entry of the success memories for every plan"""
+    r = np.random.randint(len(memory_f), size=pop_size)
+    cr = np.clip(np.random.normal(memory_cr[r], ADAPTIVE_SPREAD), 0.0, 1.0)
+    return _cauchy_scale_factors(memory_f[r]), cr
+
+
+def current_to_pbest(pop, fitness, archive, p, scale_factors):
+    """current-to-pbest/1 mutation with an external archive. returns the
+    arrays b, c, d for de_operator(), so that its donor b + F (c - d) is
+    x + F (x_pbest - x) + F (x_r1 - x_r2). pbest is one of the p best plans,
+    x_r2 may come from the archive of replaced parents"""
+    n = len(pop)
+    order = np.argsort(fitness)[::-1]
+    n_best = np.maximum(1, np.round(np.multiply(p, n))).astype(int)
+    pbest = order[(np.random.random(n) * n_best).astype(int)]
+    r = random_distinct_indices(n, 2, exclude_self=True)
+    r2 = np.random.randint(n + len(archive), size=n)
+    union = np.concatenate((pop, archive)) if len(archive) else pop
+    r2 = np.where(r2 < n, r[:, 1], r2)
+    b = pop + np.reshape(scale_factors, (-1, 1)) * (pop[pbest] - pop)
+    return b, pop[r[:, 0]], union[r2]
+
+
+def fit_surrogate(genomes, perfs):
+    """least squares fit of a linear surrogate model predicting the
+    performance after a plan from its training day loads. returns the
+    weights, the last one is the intercept"""
+    x = np.column_stack((genomes, np.ones(len(genomes))))
+    return np.linalg.lstsq(x, perfs, rcond=-1)[0]
+
+
+def surrogate_perfs(weights, genomes):
+    return genomes.dot(weights[:-1]) + weights[-1]
+
 
+def _cauchy_scale_factors(loc):
+    f = np.empty(len(loc))
+    redraw = np.ones(len(loc), dtype=bool)
+    while redraw.any():     # F <= 0 is drawn again, F > 1 is cut
+        f[redraw] = loc[redraw] + ADAPTIVE_SPREAD * np.tan(
+            np.pi * (np.random.random(redraw.sum()) - 0.5))
+        redraw = f <= 0.0
+    return np.minimum(f, 1.0)
 
-def generate_population(weeks,
-                        training_days,
-                        pop_size,
-                        max_load,
-                        min_load,
-                        pop_init_divisor):
-    p = [np.empty(weeks * 7)] * pop_size
-    off_days = u.calc_offdays(training_days, weeks)
-    for i in range(pop_size):
-        p[i] = generate_individual(weeks,
-                                   off_days,
-                                   max_load,
-                                   min_load,
-                                   pop_init_divisor)
+
+def update_adaptive_memory(strategy, memory_f, memory_cr, k, s_f, s_cr,
+                           improvements):
+    """updates the F and CR memories in place with the parameters of the
+    successful trials. jade moves its single entry towards the (Lehmer)
+    means, shade overwrites entry k with the improvement weighted means.
+    returns the next k"""
+    if len(s_f) == 0:
+        return k
+    if strategy == 'jade':
+        w = np.ones(len(s_f)) / len(s_f)
+    else:
+        w = improvements / improvements.sum()
+    mean_f = np.sum(w * s_f ** 2) / np.sum(w * s_f)     # Lehmer mean
+    mean_cr = np.sum(w * s_cr)
+    if strategy == 'jade':
+        c = JADE_LEARNING_RATE
+        memory_f[0] = (1 - c) * memory_f[0] + c * mean_f
+        memory_cr[0] = (1 - c) * memory_cr[0] + c * mean_cr
+        return 0
+    memory_f[k] = mean_f
+    memory_cr[k] = mean_cr
+    return (k + 1) % len(memory_f)
+
+
+DITHER_SCALE_FACTORS = [0.5, 0.6, 0.7, 0.8, 0.9, 1.0, 1.1, 1.2, 1.3, 1.4,
+                        1.5, 1.6, 1.7, 1.8, 1.9, 2.0]
+
+
+def genome_index(training_days):
+    """returns the sorted calendar indexes of the genes of a plan, the DE
+    genome only holds the loads of the training days"""
+    return np.unique(np.asarray(training_days, dtype=int))
+
+
+def generate_genomes(genes, pop_size, max_load, min_load, pop_init_divisor):
+    """returns a (pop_size x genes) array of random training day loads with
+    an upper bound of max_load / pop_init_divisor and a lower bound of
+    min_load"""
+    p = np.random.random((pop_size, genes)) * (max_load / pop_init_divisor)
+    p[p < min_load] = min_load
     return p
 
 
-def rand_scale_fac():
-    f = [0.5, 0.6, 0.7, 0.8, 0.9, 1.0, 1.1, 1.2, 1.3, 1.4, 1.5, 1.6, 1.7, 1.8,
-         1.9, 2.0]
-    i = np.random.randint(len(f))
-    return f[i]
+def to_calendar(genomes, genes, calendar):
+    """scatters the genomes to the training days of the calendar array, whose
+    off-days stay 0.0. returns the calendar"""
+    calendar[:len(genomes), genes] = genomes
+    return calendar[:len(genomes)]
+
+
+def rand_scale_fac(size=None):
+    """returns a random scale factor for dithering, or an array of size
+    factors"""
+    return np.random.choice(DITHER_SCALE_FACTORS, size)
 
 
 def differential_evolution(weeks,
@@ -69,72 +167,206 @@ def differential_evolution(weeks,
                            pop_size,
                            max_load,
                            min_load,
-                           model_perf_func,
-                           prequel_plan=[],     # prepend to solution candidates
+                           model,               # e.g. fitnessfatigue
+                           prequel_state=None,  # continue from prequel
                            pp_func=None,        # post processing function
                            recomb_weight=0.7,
                            scale_factor=None,   # None means dithering
                            pop_init_divisor=10,
+                           stats=None,          # dict to report counters
+                           history=None,        # list to record fitness
+                           history_every=10,
+                           migrate=None,        # island model hook
+                           time_budget=None,    # in seconds
+                           max_evaluations=None,
+                           seeds=None,          # warm start plans
+                           strategy='rand',     # see STRATEGIES
+                           surrogate_fraction=None,
+                           surrogate_refit=5,   # in generations
                            **model_parameters):
+    """model is a model module like fitnessfatigue or perpot, the
+    model_parameters are passed to its final(). prequel_state is the model
+    state after the prequel plan as returned by the model's prequel_state().
+    the fitness of every individual is kept alongside the population, so only
+    new trial plans are scored. if stats is a dict, the number of model
+    evaluations, generations and the run time are stored in it. if history is
+    a list, (generation, max fitness, mean fitness) of every history_every-th
+    generation is appended to it. only the current and the next population
+    are kept, in two preallocated (pop_size x training days) arrays, the
+    genomes hold only the loads of the training days. migrate is called
+    as migrate(t, pop, fitness) after every generation, it may replace plans
+    and their fitness in place and stops the run by returning True. when the
+    time_budget or max_evaluations run out, the best plan so far is returned
+    and stats['budget_limited'] is set. seeds are plans which replace random
+    plans of the initial population, see plan_util.adapt_plan(). pp_func
+    gets calendar plans, loads it moves to off-days are dropped. the jade and
+    shade strategies ignore recomb_weight and scale_factor and adapt them
+    instead. stats['evaluations_to_threshold'] counts the evaluations until
+    the first good enough plan. with a surrogate_fraction only that share of
+    the trials, the ones a linear surrogate of the model ranks most likely to
+    beat their parents, is simulated. the others lose without evaluation.
+    the surrogate is refitted on the latest simulated plans every
+    surrogate_refit generations"""
+    if strategy not in STRATEGIES:
+        raise ValueError('unknown differential evolution strategy {}'.
+                         format(strategy))
     t = 0   # generation counter
-    fitness_t = [0.0] * pop_size
-    fitness_t_minus_1 = [0.0] * pop_size
+    evaluations = 0
     local_optima_counter = 0
-    pops = [generate_population(weeks,
-                                training_days,
-                                pop_size,
-                                max_load,
-                                min_load,
-                                pop_init_divisor)]
+    genes = genome_index(training_days)
+    calendar = np.zeros((pop_size, weeks * 7))  # off-days are always 0.0
+    off_days = np.ones(weeks * 7, dtype=bool)
+    off_days[genes] = False
+
+    def post_process(genomes):
+        plans = to_calendar(genomes, genes, calendar)
+        for plan in plans:
+            plan[:] = pp_func(plan)
+        # the genome has no place for loads moved to off-days
+        plans[:, off_days] = 0.0
+        return plans[:, genes]
+
+    # latest simulated genomes and their performances for the surrogate
+    samples = np.empty((SURROGATE_SAMPLES * pop_size, len(genes)))
+    sample_perfs = np.empty(len(samples))
+    sampled = 0
+    surrogate = None
+    skipped = 0
+
+    def score(genomes):
+        nonlocal sampled
+        plans = to_calendar(genomes, genes, calendar)
+        perfs = model.final(plans, model_parameters, prequel_state)
+        if surrogate_fraction is not None:
+            rows = np.arange(sampled, sampled + len(genomes)) % len(samples)
+            samples[rows] = genomes
+            sample_perfs[rows] = perfs
+            sampled += len(genomes)
+        return u.fitness_from_perfs(perfs,
+                                    plans.sum(axis=1),
+                                    goal,
+                                    GOOD_ENOUGH_THRES)
+
+    pop = generate_genomes(len(genes),
+                           pop_size,
+                           max_load,
+                           min_load,
+                           pop_init_divisor)
+    if seeds is not None and len(seeds):
+        seeds = np.asarray(seeds, dtype=np.double)[:pop_size, genes]
+        pop[:len(seeds)] = seeds
     if pp_func is not None:
-        pops[0] = list(map(pp_func, pops[0]))
+        pop = post_process(pop)
+    next_pop = np.empty_like(pop)   # double buffer
+    parents = np.empty_like(pop)
+    survivors = pop_size            # plans of pop still in the race
+    fitness_t, good_enoughs = score(pop)
+    evaluations += pop_size
+    evaluations_to_threshold = None
+    # success memories of F and CR and the archive of replaced parents
+    memory_f = np.full(1 if strategy == 'jade' else pop_size, 0.5)
+    memory_cr = np.full(len(memory_f), 0.5)
+    memory_k = 0
+    archive = np.empty((0, len(genes)))
     good_enough = False
+    budget_limited = False
     run_time = 0
     start_time = int(time.time())
-    preq_plan = np.array(prequel_plan)
+    deadline = None if time_budget is None else time.time() + time_budget
 
     print('pop_init_divisor = {}'.format(pop_init_divisor))
     while t < 1000 and not good_enough and local_optima_counter < 40:
-        pops.append([0] * pop_size)           # preallocate space for pointers
+        if ((deadline is not None and time.time() >= deadline) or
+                (max_evaluations is not None and
+                 evaluations + pop_size > max_evaluations)):
+            budget_limited = True
+            break
         fitness_t_minus_1 = fitness_t.copy()  # copy last run fitness values
-
-        for i in range(pop_size):
+        if strategy == 'rand':
             if scale_factor is None:
-                scale_fac = rand_scale_fac()
+                scale_facs = rand_scale_fac(pop_size)
             else:
-                scale_fac = scale_factor
-            a_i, b_i, c_i, d_i = np.random.choice(pop_size, 4, False)
-            a, b, c, d = pops[t][a_i], pops[t][b_i], pops[t][c_i], pops[t][d_i]
-            a_p = de_operator(a, b, c, d, max_load, min_load, recomb_weight, scale_fac)
-            if pp_func is not None:
-                a_p = pp_func(a_p)
-            a_p_fit, a_p_good_enough = u.fitness(np.concatenate((preq_plan, a_p)),
-                                                 goal,
-                                                 GOOD_ENOUGH_THRES,
-                                                 model_perf_func,
-                                                 **model_parameters)
-            a_fit, a_good_enough = u.fitness(np.concatenate((preq_plan, a)),
-                                             goal,
-                                             GOOD_ENOUGH_THRES,
-                                             model_perf_func,
-                                             **model_parameters)
-            if a_p_fit >= a_fit:
-                pops[t+1][i] = a_p
-                fitness_t[i] = a_p_fit
-                if a_p_good_enough:
-                    good_enough = True
-                    pops[t+1] = pops[t+1][:i+1]  # remove superfluous entries
-                    fitness_t = fitness_t[:i+1]  # remove superfluous entries
-                    break
+                scale_facs = scale_factor
+            crs = recomb_weight
+            abcd = random_distinct_indices(pop_size, 4)
+            targets = abcd[:, 0]
+            b, c, d = pop[abcd[:, 1]], pop[abcd[:, 2]], pop[abcd[:, 3]]
+        else:
+            scale_facs, crs = sample_adaptive_parameters(memory_f,
+                                                         memory_cr,
+                                                         pop_size)
+            if strategy == 'jade':
+                p = JADE_P
             else:
-                pops[t+1][i] = a
-                fitness_t[i] = a_fit
-                if a_good_enough:
-                    good_enough = True
-                    pops[t+1] = pops[t+1][:i+1]  # remove superfluous entries
-                    fitness_t = fitness_t[:i+1]  # remove superfluous entries
-                    break
+                p = np.random.uniform(2 / pop_size, 0.2, pop_size)
+            targets = np.arange(pop_size)
+            b, c, d = current_to_pbest(pop, fitness_t, archive, p, scale_facs)
+        np.take(pop, targets, axis=0, out=parents)
+        a_fits = fitness_t[targets]
+        a_good_enoughs = good_enoughs[targets]
+        trials = de_operator(parents,
+                             b,
+                             c,
+                             d,
+                             max_load,
+                             min_load,
+                             crs,
+                             scale_facs)
+        if pp_func is not None:
+            trials = post_process(trials)
+
+        # only the trials are new, score them with one model call
+        if surrogate_fraction is None:
+            a_p_fits, a_p_good_enoughs = score(trials)
+            evaluations += len(trials)
+        else:
+            if t % surrogate_refit == 0:
+                n = min(sampled, len(samples))
+                surrogate = fit_surrogate(samples[:n], sample_perfs[:n])
+            predicted, _ = u.fitness_from_perfs(
+                surrogate_perfs(surrogate, trials),
+                trials.sum(axis=1),
+                goal,
+                GOOD_ENOUGH_THRES)
+            n = int(np.ceil(surrogate_fraction * pop_size))
+            promising = np.argsort(predicted - a_fits)[::-1][:n]
+            a_p_fits = np.full(pop_size, -np.inf)
+            a_p_good_enoughs = np.zeros(pop_size, dtype=bool)
+            a_p_fits[promising], a_p_good_enoughs[promising] = \
+                score(trials[promising])
+            evaluations += n
+            skipped += pop_size - n
+        take_trial = a_p_fits >= a_fits
+        np.copyto(next_pop, parents)
+        next_pop[take_trial] = trials[take_trial]
+        fitness_t = np.where(take_trial, a_p_fits, a_fits)
+        good_enoughs = np.where(take_trial, a_p_good_enoughs, a_good_enoughs)
+        if strategy != 'rand':
+            improved = a_p_fits > a_fits
+            memory_k = update_adaptive_memory(strategy,
+                                              memory_f,
+                                              memory_cr,
+                                              memory_k,
+                                              scale_facs[improved],
+                                              crs[improved],
+                                              (a_p_fits - a_fits)[improved])
+            archive = np.concatenate((archive, parents[improved]))
+            if len(archive) > pop_size:     # drop random archived plans
+                keep = np.random.choice(len(archive), pop_size, False)
+                archive = archive[keep]
+        if good_enoughs.any():
+            good_enough = True
+            evaluations_to_threshold = evaluations
+            survivors = np.argmax(good_enoughs) + 1  # first good enough plan
+            fitness_t = fitness_t[:survivors]  # remove superfluous entries
+        pop, next_pop = next_pop, pop
+        if migrate is not None and not good_enough:
+            if migrate(t, pop, fitness_t):
+                t += 1
+                break
         print('gen {}: max fitness {}'.format(t, max(fitness_t)))
+        if history is not None and t % history_every == 0:
+            history.append((t, max(fitness_t), np.mean(fitness_t)))
         t += 1
         if max(fitness_t) == max(fitness_t_minus_1):
             local_optima_counter += 1
@@ -142,15 +374,172 @@ def differential_evolution(weeks,
             local_optima_counter = 0
         run_time = int(time.time()) - start_time
 
-    s = sorted(pops[-1], key=lambda p: u.fitness(np.concatenate((preq_plan, p)),
-                                                 goal,
-                                                 GOOD_ENOUGH_THRES,
-                                                 model_perf_func,
-                                                 **model_parameters)[0])
     print('run_time: {}'.format(run_time))
     print('local_optima_counter: {}'.format(local_optima_counter))
     print('good_enough: {}'.format(good_enough))
-    return s[-1]
+    print('evaluations: {}'.format(evaluations))
+    print('budget_limited: {}'.format(budget_limited))
+    print('evaluations_to_threshold: {}'.format(evaluations_to_threshold))
+    if surrogate_fraction is not None:
+        print('surrogate skipped trials: {}'.format(skipped))
+    best = np.argmax(fitness_t)
+    if stats is not None:
+        stats['evaluations'] = evaluations
+        stats['generations'] = t
+        stats['run_time'] = run_time
+        stats['fitness'] = fitness_t[best]
+        stats['good_enough'] = good_enough
+        stats['budget_limited'] = budget_limited
+        stats['evaluations_to_threshold'] = evaluations_to_threshold
+        stats['surrogate_skipped'] = skipped
+    plan = np.zeros(weeks * 7)
+    plan[genes] = pop[:survivors][best]
+    return plan
+
+
+# arguments of the restarts, inherited by the forked pool processes
+_restart_args = None
+
+
+def _init_restart(args, kwargs):
+    global _restart_args
+    _restart_args = (args, kwargs)
+    np.random.seed()    # forked processes share the parent's random state
+
+
+def _restart(pop_init_divisor):
+    args, kwargs = _restart_args
+    stats = {}
+    solution = differential_evolution(*args,
+                                      pop_init_divisor=pop_init_divisor,
+                                      stats=stats,
+                                      **kwargs)
+    return solution, stats
+
+
+def parallel_restarts(pop_init_divisors, *args, **kwargs):
+    """runs differential_evolution once per pop_init_divisor, each in its own
+    process. args and kwargs are passed on to differential_evolution. the
+    first good enough solution cancels the other runs, otherwise the fittest
+    solution wins. returns the solution and the stats of its run"""
+    pool = multiprocessing.Pool(len(pop_init_divisors),
+                                _init_restart,
+                                (args, kwargs))
+    best = None
+    try:
+        for solution, stats in pool.imap_unordered(_restart,
+                                                   pop_init_divisors):
+            if best is None or stats['fitness'] > best[1]['fitness']:
+                best = (solution, stats)
+            if stats['good_enough']:
+                break
+    finally:
+        pool.terminate()
+    return best
+
+
+MIGRATION_TOPOLOGIES = ['ring', 'fully_connected', 'random']
+
+# shared state of the islands, inherited by the forked pool processes
+_islands = None
+
+
+def _init_island(args, kwargs, shared, config):
+    global _islands
+    _init_restart(args, kwargs)
+    _islands = (shared, config)
+
+
+def _migrants_from(island, islands, topology):
+    """returns the islands whose migrants the island receives"""
+    others = [i for i in range(islands) if i != island]
+    if topology == 'ring':
+        return [(island - 1) % islands]
+    elif topology == 'random':
+        return [others[np.random.randint(len(others))]]
+    return others
+
+
+def _island(island):
+    args, kwargs = _restart_args
+    (plans, fits, stop), (islands, interval, migrants, topology) = _islands
+    days = len(plans) // (islands * migrants)  # genes of the genomes
+    # views on this island's slots of the shared memory
+    slots = np.frombuffer(plans.get_obj()).reshape(islands, migrants, days)
+    slot_fits = np.frombuffer(fits.get_obj()).reshape(islands, migrants)
+
+    def migrate(t, pop, fitness):
+        if stop.value:
+            return True
+        if (t + 1) % interval != 0:
+            return False
+        best = np.argsort(fitness)[::-1][:migrants]
+        with plans.get_lock(), fits.get_lock():
+            # asynchronous migration, islands don't wait for each other
+            slots[island, :len(best)] = pop[best]
+            slot_fits[island, :len(best)] = fitness[best]
+            sources = _migrants_from(island, islands, topology)
+            immigrants = slots[sources].reshape(-1, days).copy()
+            immigrant_fits = slot_fits[sources].reshape(-1).copy()
+        arrived = immigrant_fits > -np.inf
+        immigrants = immigrants[arrived]
+        immigrant_fits = immigrant_fits[arrived]
+        best_immigrants = np.argsort(immigrant_fits)[::-1][:migrants]
+        worst = np.argsort(fitness)[:len(best_immigrants)]
+        pop[worst] = immigrants[best_immigrants]
+        fitness[worst] = immigrant_fits[best_immigrants]
+        return False
+
+    stats = {}
+    solution = differential_evolution(*args,
+                                      stats=stats,
+                                      migrate=migrate,
+                                      **kwargs)
+    if stats['good_enough']:
+        stop.value = True
+    return solution, stats
+
+
+def island_differential_evolution(islands,
+                                  weeks,
+                                  goal,
+                                  training_days,
+                                  *args,
+                                  migration_interval=10,
+                                  migrants=2,
+                                  topology='ring',
+                                  **kwargs):
+    """island model: runs one differential_evolution per island, each with
+    its own population of pop_size plans in its own process. every
+    migration_interval generations the best migrants plans of an island
+    replace the worst plans of the islands it sends to according to the
+    topology, see MIGRATION_TOPOLOGIES. the first good enough island stops
+    all the others. returns a good enough or else the fittest solution and
+    the stats of its run like parallel_restarts(). the other args and kwargs
+    are passed on to differential_evolution()"""
+    if topology not in MIGRATION_TOPOLOGIES:
+        raise ValueError('unknown migration topology {}'.format(topology))
+    genes = len(genome_index(training_days))
+    plans = multiprocessing.Array('d', islands * migrants * genes)
+    fits = multiprocessing.Array('d', [-np.inf] * (islands * migrants))
+    stop = multiprocessing.Value('b', False)
+    pool = multiprocessing.Pool(islands,
+                                _init_island,
+                                ((weeks, goal, training_days) + args,
+                                 kwargs,
+                                 (plans, fits, stop),
+                                 (islands, migration_interval, migrants,
+                                  topology)))
+    best = None
+    try:
+        for solution, stats in pool.imap_unordered(_island, range(islands)):
+            rank = (stats['good_enough'], stats['fitness'])
+            if best is None or rank > (best[1]['good_enough'],
+                                       best[1]['fitness']):
+                best = (solution, stats)
+    finally:
+        pool.terminate()
+    return best
 
 
 def fitnessfatigue_example(ff_args):
@@ -169,8 +558,8 @@ def fitnessfatigue_example(ff_args):
                                       POP_SIZE,
                                       max_load,
                                       min_load,
-                                      ff_model.after_plan,
-                                      prequel_plan=[],
+                                      ff_model,
+                                      prequel_state=None,
                                       pp_func=u.sort_loads,
                                       recomb_weight=0.7,
                                       scale_factor=0.8,
@@ -1,6 +1,16 @@
 from __future__ import division
 import numpy as np
 
+try:
+    from . import impulseresponse as ir
+except SystemError:
+    import impulseresponse as ir
+
+# model interface: simulate(), final() and simulate_with_jacobian() take
+# parameter dicts with these keys
+PARAMETERS = ('initial_p', 'k_1', 'tau_1', 'k_2', 'tau_2')
+FITTED_PARAMETERS = PARAMETERS
+
 
 def make_load_func(plan):
 
@@ -45,15 +55,29 @@ def discrete_p(n, initial_p, tau_1, tau_2, k_1, k_2, w):
     return initial_p + k_1 * g - k_2 * h
 
 
+def decayed_loads(plan, tau):
+    '''returns the exponentially decayed load sums for every day of the plan,
+    i.e. discrete_g(n, tau, w) for n = 1..len(plan)'''
+    return ir.exponential_response(plan, tau)
+
+
+def ff_kernel(n, k_1, tau_1, k_2, tau_2):
+    '''returns the combined impulse response of fitness and fatigue for n
+    lags. the FF model is the convolution of the plan with this kernel'''
+    return k_1 * ir.exponential_kernel(n, tau_1) - \
+        k_2 * ir.exponential_kernel(n, tau_2)
+
+
 def discrete_p_curve_fit(plans, initial_p, k_1, tau_1, k_2, tau_2):
     '''takes a list of plans. to be used with scipy.optimize.curve_fit'''
     results = [0.0] * len(plans)
     for i, plan in enumerate(plans):
-        w = make_load_func(plan)
-        n = len(plan)
-        g = discrete_g(n, tau_1, w)
-        h = discrete_h(n, tau_2, w)
-        results[i] = initial_p + k_1 * g - k_2 * h
+        results[i] = performance_over_time(plan,
+                                           initial_p,
+                                           k_1,
+                                           tau_1,
+                                           k_2,
+                                           tau_2)[-1]
     return results
 
 
@@ -67,14 +91,25 @@ def leistungs_entwicklung(n, initial_p, tau_1, tau_2, k_1, k_2, w):
 
 
 def performance_over_time(plan, initial_p, k_1, tau_1, k_2, tau_2):
-    n = len(plan)
-    p_values = np.empty(n, dtype=np.double)
-    w = make_load_func(plan)
-    for i in range(1, n+1):
-        g = discrete_g(i, tau_1, w)
-        h = discrete_h(i, tau_2, w)
-        p_values[i-1] = (initial_p + k_1 * g - k_2 * h)
-    return p_values
+    return initial_p + k_1 * ir.exponential_response(plan, tau_1) - \
+        k_2 * ir.exponential_response(plan, tau_2)
+
+
+def busso_performance_over_time(plan,
+                                initial_p,
+                                k_1,
+                                tau_1,
+                                k_3,
+                                tau_2,
+                                tau_3):
+    '''variable dose-response variant of the model (Busso 2003). the fatigue
+    gain k_2 isn't constant but grows with the recent loads:
+    k_2(i) = k_3 * sum of w(j) * exp(-(i-j)/tau_3) for j = 1..i'''
+    plan = np.asarray(plan, dtype=np.double)
+    k_2 = k_3 * ir.exponential_response(plan, tau_3, delay=0)
+    fitness = ir.exponential_response(plan, tau_1)
+    fatigue = ir.exponential_response(k_2 * plan, tau_2)
+    return initial_p + k_1 * fitness - fatigue
 
 
 def performance_over_time2(plan, parms):
@@ -86,15 +121,100 @@ def performance_over_time2(plan, parms):
                                  parms[4])
 
 
+def performance_over_time_with_jacobian(plan, parms):
+    '''returns the performance curve for parms = [initial_p, k_1, tau_1, k_2,
+    tau_2] and its partial derivatives with respect to these parameters as a
+    (days x 5) array'''
+    initial_p, k_1, tau_1, k_2, tau_2 = parms
+    n = len(plan)
+    g = ir.exponential_response(plan, tau_1)
+    h = ir.exponential_response(plan, tau_2)
+    # d/dtau exp(-t/tau) = t/tau^2 * exp(-t/tau)
+    dg_dtau_1 = ir.lag_weighted_exponential_response(plan, tau_1) / tau_1**2
+    dh_dtau_2 = ir.lag_weighted_exponential_response(plan, tau_2) / tau_2**2
+    jac = np.column_stack((np.ones(n),
+                           g,
+                           k_1 * dg_dtau_1,
+                           -h,
+                           -k_2 * dh_dtau_2))
+    return initial_p + k_1 * g - k_2 * h, jac
+
+
 def after_plan(plan, **kwargs):
-    w = make_load_func(plan)
-    return discrete_p(len(plan),
-                      kwargs['initial_p'],
-                      kwargs['tau_1'],
-                      kwargs['tau_2'],
-                      kwargs['k_1'],
-                      kwargs['k_2'],
-                      w)
+    return performance_over_time(plan,
+                                 kwargs['initial_p'],
+                                 kwargs['k_1'],
+                                 kwargs['tau_1'],
+                                 kwargs['k_2'],
+                                 kwargs['tau_2'])[-1]
+
+
+def after_plan_coefficients(n, state=None, **kwargs):
+    '''the performance after an n days plan is linear in its loads. returns the
+    offset and the weights of the daily loads, so that the performance after
+    a plan is offset + weights.dot(plan). with a state from prequel_state()
+    the offset contains the effect of the prequel'''
+    kernel = ff_kernel(n,
+                       kwargs['k_1'],
+                       kwargs['tau_1'],
+                       kwargs['k_2'],
+                       kwargs['tau_2'])
+    offset = kwargs['initial_p']
+    if state is not None:
+        offset += kwargs['k_1'] * state['fitness'] * np.exp(-n / kwargs['tau_1'])
+        offset -= kwargs['k_2'] * state['fatigue'] * np.exp(-n / kwargs['tau_2'])
+    return offset, kernel[::-1]
+
+
+def after_plan_batch(plans, state=None, **kwargs):
+    '''takes a (plans x days) array and returns the performances after every
+    plan and the total workloads of the plans. with a state from
+    prequel_state() the plans are continued from the end of the prequel'''
+    plans = np.atleast_2d(np.asarray(plans, dtype=np.double))
+    offset, weights = after_plan_coefficients(plans.shape[1], state, **kwargs)
+    return offset + plans.dot(weights), plans.sum(axis=1)
+
+
+def prequel_state(prequel_plan, **kwargs):
+    '''simulates the prequel plan once and returns the model state at the end
+    of its last day, i.e. the decayed fitness and fatigue load sums including
+    the load of the last day'''
+    n = len(prequel_plan)
+    fitness_kernel = ir.exponential_kernel(n, kwargs['tau_1'], delay=0)
+    fatigue_kernel = ir.exponential_kernel(n, kwargs['tau_2'], delay=0)
+    return {'fitness': ir.final_response(prequel_plan, fitness_kernel),
+            'fatigue': ir.final_response(prequel_plan, fatigue_kernel)}
+
+
+def after_plan_from_state(plan, state, **kwargs):
+    '''returns the performance after the plan continued from the given
+    prequel_state(). equals after_plan(prequel_plan + plan)'''
+    return after_plan_batch([plan], state, **kwargs)[0][0]
+
+
+def simulate(plans, params):
+    '''model interface: returns the performance curves of a (plans x days)
+    array as a (plans x days) array'''
+    plans = np.atleast_2d(np.asarray(plans, dtype=np.double))
+    return performance_over_time(plans,
+                                 params['initial_p'],
+                                 params['k_1'],
+                                 params['tau_1'],
+                                 params['k_2'],
+                                 params['tau_2'])
+
+
+def final(plans, params, state=None):
+    '''model interface: returns the performances after every plan of a
+    (plans x days) array, optionally continued from a prequel_state()'''
+    return after_plan_batch(plans, state, **params)[0]
+
+
+def simulate_with_jacobian(plan, params):
+    '''model interface: returns the performance curve of a single plan and
+    its derivatives with respect to the FITTED_PARAMETERS'''
+    return performance_over_time_with_jacobian(plan,
+                                               [params[p] for p in PARAMETERS])
 
 
 def examplenew():
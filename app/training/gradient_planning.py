@@ -0,0 +1,82 @@
+import numpy as np
+from scipy.optimize import minimize
+
+try:
+    from . import perpot as pp
+    from . import plan_util as u
+except SystemError:
+    import perpot as pp
+    import plan_util as u
+
+# the min and max of perpot are rounded off less and less, 0.0 at the end
+# is the exact model
+SMOOTHINGS = (0.1, 0.01, 0.001, 0.0)
+
+
+def objective_and_gradient(loads, goal, training_days, plan_length,
+                           smoothing, model_parameters):
+    '''|goal - perf| + WORKLOAD_FACTOR * total workload of the plan with the
+    loads on the training days and its gradient. the absolute value is
+    rounded off by smoothing just like the perpot rates'''
+    plan = np.zeros(plan_length)
+    plan[training_days] = loads
+    perf, gradient = pp.after_plan_with_load_gradient(plan,
+                                                      smoothing,
+                                                      **model_parameters)
+    deviation = np.sqrt((goal - perf) ** 2 + smoothing ** 2)
+    slope = (perf - goal) / deviation if deviation > 0 else 0.0
+    return (deviation + u.WORKLOAD_FACTOR * np.sum(loads),
+            slope * gradient[training_days] + u.WORKLOAD_FACTOR)
+
+
+def genplan(length,  # in weeks
+            goal,
+            training_days,
+            max_load,
+            min_load,
+            prequel_state,
+            pp_func=None,   # optional repair step, e.g. u.sort_loads
+            smoothings=SMOOTHINGS,
+            seed=None,      # warm start plan
+            stats=None,
+            **model_parameters):
+    '''generate a perpot plan with L-BFGS-B and exact gradients. the plan is
+    optimized for a smooth relaxation of perpot and then for ever smaller
+    smoothings, with a smoothing of 0.0 last to polish the plan on the exact
+    model. every objective evaluation is one forward and one backward pass
+    over the days instead of a finite difference per training day. if stats
+    is a dict, the evaluations and the exact objective are stored in it'''
+    plan_length = length * 7
+    training_days = np.asarray(training_days, dtype=int)
+    if prequel_state is not None:
+        model_parameters = dict(model_parameters, **prequel_state)
+    if seed is None:
+        x = np.full(len(training_days), min_load, dtype=np.double)
+    else:
+        x = np.array([seed[i] for i in training_days], dtype=np.double)
+    bounds = [(min_load, max_load)] * len(training_days)
+    evaluations = 0
+    best_x, best_f = None, None
+    for smoothing in smoothings:
+        optres = minimize(objective_and_gradient,
+                          x,
+                          (goal, training_days, plan_length, smoothing,
+                           model_parameters),
+                          'L-BFGS-B',
+                          jac=True,
+                          bounds=bounds)
+        evaluations += optres.nfev
+        x = optres.x
+        f = objective_and_gradient(x, goal, training_days, plan_length, 0.0,
+                                   model_parameters)[0]
+        # the exact model decides, a rougher smoothing may have been better
+        if best_f is None or f < best_f:
+            best_x, best_f = x, f
+    if stats is not None:
+        stats['evaluations'] = evaluations
+        stats['objective'] = best_f
+    plan = np.zeros(plan_length)
+    plan[training_days] = best_x
+    if pp_func is not None:
+        plan = np.array(pp_func(plan))
+    return plan
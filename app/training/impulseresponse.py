@@ -0,0 +1,89 @@
+from __future__ import division
+import numpy as np
+from scipy.linalg import toeplitz
+from scipy.signal import lfilter
+
+# load series of at least this many days are convolved via FFT
+FFT_MIN_LENGTH = 512
+
+
+def exponential_kernel(n, tau, delay=1):
+    '''returns the impulse response exp(-t/tau) for the lags t = 0..n-1. lags
+    smaller than delay are 0.0, by default a load affects the performance
+    from the next day on'''
+    kernel = np.exp(-np.arange(n, dtype=np.double) / tau)
+    kernel[:delay] = 0.0
+    return kernel
+
+
+def truncated_exponential_kernel(n, tau, cutoff, delay=1):
+    '''returns an exponential kernel which ignores loads older than cutoff
+    days'''
+    kernel = exponential_kernel(n, tau, delay)
+    kernel[cutoff + 1:] = 0.0
+    return kernel
+
+
+def exponential_response(loads, tau, delay=1):
+    '''returns convolve(loads, exponential_kernel(n, tau, delay)) in O(n) with
+    the recurrence r(i) = exp(-1/tau) * r(i-1) + exp(-delay/tau) * w(i-delay)
+    as a linear filter over the days. loads is either a single plan or a
+    (plans x days) array'''
+    decay = np.exp(-1 / tau)
+    b = np.zeros(delay + 1)
+    b[delay] = decay ** delay
+    return lfilter(b, [1.0, -decay], np.asarray(loads, dtype=np.double))
+
+
+def lag_weighted_exponential_response(loads, tau):
+    '''returns convolve(loads, t * exponential_kernel(n, tau)) for the lags t,
+    the derivative of an exponential response with respect to tau times
+    tau^2, in O(n) as a second order linear filter'''
+    decay = np.exp(-1 / tau)
+    return lfilter([0.0, decay],
+                   [1.0, -2 * decay, decay ** 2],
+                   np.asarray(loads, dtype=np.double))
+
+
+def convolve(loads, kernel):
+    '''returns the causal convolution of the loads with the kernel, i.e. the
+    response on every day of the plan. loads is either a single plan or a
+    (plans x days) array. short plans are convolved directly in O(n^2), long
+    plans via FFT. pure exponential kernels are faster with
+    exponential_response()'''
+    loads = np.asarray(loads, dtype=np.double)
+    if loads.shape[-1] == 0:
+        return np.zeros(loads.shape)    # an empty plan has no response
+    kernel = _fit_kernel(kernel, loads.shape[-1])
+    if len(kernel) < FFT_MIN_LENGTH:
+        return _direct_convolve(loads, kernel)
+    return _fft_convolve(loads, kernel)
+
+
+def final_response(loads, kernel):
+    '''returns only the response on the last day of the plan(s), which is a
+    plain dot product with the reversed kernel'''
+    loads = np.asarray(loads, dtype=np.double)
+    return loads.dot(_fit_kernel(kernel, loads.shape[-1])[::-1])
+
+
+def _fit_kernel(kernel, n):
+    '''returns the kernel cut or zero padded to n lags'''
+    kernel = np.asarray(kernel, dtype=np.double)[:n]
+    return np.concatenate((kernel, np.zeros(n - len(kernel))))
+
+
+def _direct_convolve(loads, kernel):
+    n = loads.shape[-1]
+    if loads.ndim == 1:
+        return np.convolve(loads, kernel)[:n]
+    first_col = np.zeros(n)
+    first_col[0] = kernel[0]
+    return loads.dot(toeplitz(first_col, kernel))
+
+
+def _fft_convolve(loads, kernel):
+    n = loads.shape[-1]
+    size = 1 << (2 * n - 1).bit_length()   # avoid circular wrap-around
+    spectrum = np.fft.rfft(loads, size, axis=-1) * np.fft.rfft(kernel, size)
+    return np.fft.irfft(spectrum, size, axis=-1)[..., :n]
@@ -0,0 +1,57 @@
+import numpy as np
+from scipy.optimize import linprog
+
+try:
+    from . import plan_util as u
+except SystemError:
+    import plan_util as u
+
+
+def genplan(length,  # in weeks
+            goal,
+            training_days,
+            max_load,
+            min_load,
+            model,
+            prequel_state,
+            pp_func=None,   # optional repair step, e.g. u.sort_loads
+            ascending=False,
+            **model_parameters):
+    '''generate a plan by linear programming for a model whose performance
+    after the plan is linear in the loads, like fitnessfatigue. minimizing
+    |goal - perf| + WORKLOAD_FACTOR * total workload within the load bounds is
+    an LP with an auxiliary variable t >= |goal - perf|. with ascending the
+    loads of successive training days are constrained to not decrease, which
+    is the shape u.sort_loads produces. raises a ValueError if the LP has no
+    solution, e.g. for a min_load above the max_load'''
+    plan_length = length * 7
+    # read the linear coefficients off the model: perf = offset + weights.x
+    offset = model.final(np.zeros((1, plan_length)),
+                         model_parameters,
+                         prequel_state)[0]
+    weights = model.final(np.eye(plan_length),
+                          model_parameters,
+                          prequel_state) - offset
+    n = len(training_days)
+    a = weights[training_days]
+    # variables: loads of the training days followed by t
+    c = np.append(np.ones(n) * u.WORKLOAD_FACTOR, 1.0)
+    a_ub = [np.append(-a, -1.0),    # goal - (offset + a.x) <= t
+            np.append(a, -1.0)]     # (offset + a.x) - goal <= t
+    b_ub = [offset - goal, goal - offset]
+    if ascending:
+        for i in range(n - 1):      # x_i - x_i+1 <= 0
+            row = np.zeros(n + 1)
+            row[i] = 1.0
+            row[i + 1] = -1.0
+            a_ub.append(row)
+            b_ub.append(0.0)
+    bounds = [(min_load, max_load)] * n + [(0.0, None)]
+    res = linprog(c, A_ub=np.array(a_ub), b_ub=np.array(b_ub), bounds=bounds)
+    if not res.success:
+        raise ValueError('no linear programming plan: {}'.format(res.message))
+    plan = np.zeros(plan_length)
+    plan[training_days] = res.x[:n]
+    if pp_func is not None:
+        plan = np.array(pp_func(plan))
+    return plan
@@ -2,29 +2,37 @@ from scipy import optimize
 import lmfit
 import numpy as np
 import cma
+import time
 
 try:
-    from .fitnessfatigue import performance_over_time as \
-        ff_performance_over_time
+    # celery workers are daemonic, only billiard lets them fork a pool
+    import billiard as multiprocessing
+except ImportError:
+    import multiprocessing
+
+try:
+    from . import fitnessfatigue as ff_model
+    from . import perpot as pp_model
     from .fitnessfatigue import performance_over_time2 as \
         ff_performance_over_time2
-    from .perpot import performance_over_time as pp_performance_over_time
     from .perpot import performance_over_time2 as pp_performance_over_time2
+    from .perpot import performance_over_time_batch as \
+        pp_performance_over_time_batch
     from .perpot import calc_pp_load_scale_factor, calc_pp_perf_scale_factor
     from .fitting_util import filter_model_perf_values_2_load_days
-    from .fitting_util import filter_model_perfs_2_real_perfs
     from .fitting_util import csv_value_dict_from_path
     from .fitting_util import plan_perfs_from_dic, calc_rmse, calc_residuals
 except SystemError:
-    from fitnessfatigue import performance_over_time as ff_performance_over_time
+    import fitnessfatigue as ff_model
+    import perpot as pp_model
     from fitnessfatigue import performance_over_time2 as \
         ff_performance_over_time2
-    from perpot import performance_over_time as pp_performance_over_time
     from perpot import performance_over_time2 as pp_performance_over_time2
+    from perpot import performance_over_time_batch as \
+        pp_performance_over_time_batch
     from perpot import calc_pp_load_scale_factor, calc_pp_perf_scale_factor
     # from fitting_util import choose_initial_p
     from fitting_util import filter_model_perf_values_2_load_days
-    from fitting_util import filter_model_perfs_2_real_perfs
     # from plots import plot_model_and_metrics
     # from plots import plot_model_and_metrics2
     # from plots import pp_plot_model_and_metrics2
@@ -32,92 +40,182 @@ except SystemError:
     from fitting_util import plan_perfs_from_dic, calc_rmse, calc_residuals
 
 
+class FittingProblem():
+    '''the data of one fit, prepared once instead of on every call of the
+    objective: the plan as an array and the measured days of the
+    performances (values > 0.0) as an index array with their values'''
+
+    def __init__(self, model, plan, real_perfs):
+        self.model = model
+        self.plan = np.asarray(plan, dtype=np.double)
+        self.plans = self.plan[np.newaxis]  # a batch of one for simulate()
+        real_perfs = np.asarray(real_perfs, dtype=np.double)
+        self.measured = np.flatnonzero(real_perfs > 0.0)
+        self.perfs = real_perfs[self.measured]
+
+    def model_perfs(self, parms):
+        '''returns the model performances on the measured days'''
+        return self.model.simulate(self.plans, parms)[0][self.measured]
+
+    def rmse(self, parms):
+        return calc_rmse(self.perfs, self.model_perfs(parms))
+
+
 def objective_f(x, *args):
-    '''the objective function to minimize with the optimization methods. returns
+    '''the objective function to minimize with the optimization methods. args
+    are a FittingProblem, the error function and the unpacker of x. returns
     the calculated error'''
-    plan = args[0]
-    real_perfs = args[1]
-    calc_error = args[2]
-    unpack_parms = args[3]
-    model_func = args[4]
-    model_parms = unpack_parms(x)
-    model_perfs = model_func(plan, model_parms)
-    model_perfs = filter_model_perfs_2_real_perfs(model_perfs, real_perfs)
-    real_perfs = list(filter(lambda x: x > 0.0, real_perfs))
-    assert(len(model_perfs) == len(real_perfs))
-    return calc_error(np.array(real_perfs), np.array(model_perfs))
+    problem = args[0]
+    calc_error = args[1]
+    unpack_parms = args[2]
+    return calc_error(problem.perfs, problem.model_perfs(unpack_parms(x)))
+
+
+def residuals_jac(x, *args):
+    '''the analytic jacobian of the residuals returned by objective_f with
+    calc_residuals, taken from the model's simulate_with_jacobian()'''
+    problem = args[0]
+    unpack_parms = args[2]
+    _, jac = problem.model.simulate_with_jacobian(problem.plan,
+                                                  unpack_parms(x))
+    return -jac[problem.measured]   # residuals are real - model
+
+
+def rmse_and_gradient(x, *args):
+    '''returns the rmse and its analytic gradient with respect to x, computed
+    from a single simulate_with_jacobian() call of the problem's model'''
+    problem = args[0]
+    unpack_parms = args[2]
+    model_perfs, jac = problem.model.simulate_with_jacobian(problem.plan,
+                                                            unpack_parms(x))
+    residuals = model_perfs[problem.measured] - problem.perfs
+    rmse = np.sqrt(np.mean(np.square(residuals)))
+    if rmse == 0.0:
+        return rmse, np.zeros(len(x))
+    return rmse, jac[problem.measured].T.dot(residuals) / (len(residuals) *
+                                                           rmse)
+
+
+def pp_batch_rmse(xs, problem):
+    '''returns the rmse of every PerPot parameter vector [perfpot,
+    straindelay, responsedelay, overflowdelay] in xs. all of them are
+    simulated in one batch'''
+    xs = np.asarray(xs)
+    model_perfs = pp_performance_over_time_batch(problem.plans,
+                                                 0.0,
+                                                 0.0,
+                                                 xs[:, 0],
+                                                 xs[:, 1],
+                                                 xs[:, 2],
+                                                 xs[:, 3])[0]
+    errors = model_perfs[:, problem.measured] - problem.perfs
+    return np.sqrt(np.mean(np.square(errors), axis=1))
 
 
 def unpack_ff_parms_list(x):
-    return x
+    return dict(zip(ff_model.FITTED_PARAMETERS, x))
 
 
 def unpack_pp_parms_list(x):
     # optimize delays and init_p aka perfpot
-    return [0.0, 0.0, x[0], x[1], x[2], x[3]]
+    parms = dict(zip(pp_model.FITTED_PARAMETERS, x))
+    parms['strainpot'] = 0.0
+    parms['responsepot'] = 0.0
+    return parms
 
 
 def unpack_ff_lmfit_parms(x):
     parvals = x.valuesdict()
-    return [parvals['initial_p'], parvals['k_1'], parvals['tau_1'],
-            parvals['k_2'], parvals['tau_2']]
+    return unpack_ff_parms_list([parvals[p]
+                                 for p in ff_model.FITTED_PARAMETERS])
 
 
 def unpack_pp_lmfit_parms(x):
-    # optimize delays and init_p aka perfpot
     parvals = x.valuesdict()
-    return [0.0, 0.0, parvals['perfpot'], parvals['straindelay'],
-            parvals['responsedelay'], parvals['overflowdelay']]
+    return unpack_pp_parms_list([parvals[p]
+                                 for p in pp_model.FITTED_PARAMETERS])
+
+
+def pp_fitting_problem(plan, real_perf_values):
+    '''returns the FittingProblem of the PerPot fitting, which works on
+    scaled loads and performances, and the scale factors'''
+    load_scale_factor = calc_pp_load_scale_factor(plan)
+    perf_scale_factor = calc_pp_perf_scale_factor(real_perf_values)
+    problem = FittingProblem(pp_model,
+                             load_scale_factor * np.asarray(plan),
+                             perf_scale_factor * np.asarray(real_perf_values))
+    return problem, load_scale_factor, perf_scale_factor
+
+
+def trust_region_bounds(x0, bounds, trust_region, free=()):
+    '''narrows the bounds to x0 * (1 -/+ trust_region), except for the
+    indexes in free'''
+    narrowed = []
+    for i, (x, (low, high)) in enumerate(zip(x0, bounds)):
+        if i not in free:
+            low = max(low, x * (1 - trust_region))
+            high = min(high, x * (1 + trust_region))
+        narrowed.append((low, high))
+    return narrowed
 
 
-def ff_minimize_fitting(plan, real_perf_values, method):
+def ff_minimize_fitting(plan, real_perf_values, method, x0=None,
+                        trust_region=None):
     '''generic interface for optimization.minimize for Fitness Fatigue fitting.
-    returns the OptimizeResult object.'''
-    x0 = np.array([real_perf_values[0], 1.0, 30.0, 1.0, 15.0])  # initial guess
-    args = (plan,
-            real_perf_values,
+    x0 replaces the initial guess, with a trust_region the gains and time
+    constants are searched only within that fraction around x0. returns the
+    OptimizeResult object.'''
+    if x0 is None:
+        x0 = [real_perf_values[0], 1.0, 30.0, 1.0, 15.0]  # initial guess
+    x0 = np.array(x0)
+    args = (FittingProblem(ff_model, plan, real_perf_values),
             calc_rmse,
-            unpack_ff_parms_list,
-            ff_performance_over_time2)
+            unpack_ff_parms_list)
     bounds = [(0, max(real_perf_values)),  # initial_p
               (0.01, 5),                   # k_1
               (1, 70),                     # tau_1
               (0.01, 5),                   # k_2
               (1, 70)]                     # tau_2
+    if trust_region is not None:
+        bounds = trust_region_bounds(x0, bounds, trust_region, free=[0])
     # options = {'maxiter': 50, 'disp': True}
     options = {'disp': False}
 
     def iter_callback(xk):
         print("current parameter vector: {}".format(xk))
 
-    return optimize.minimize(objective_f,
+    return optimize.minimize(rmse_and_gradient,
                              x0,
                              args,
                              method,
+                             jac=True,
                              bounds=bounds,
                              options=options,
                              callback=None)
                              # callback=iter_callback)
 
 
-def pp_minimize_fitting(plan, real_perf_values, method):
-    '''generic interface for optimization.minimize for PerPot fitting.
-    returns the OptimizeResult object and the scale factors.'''
+def pp_minimize_fitting(plan, real_perf_values, method, x0=None,
+                        trust_region=None):
+    '''generic interface for optimization.minimize for PerPot fitting. x0
+    replaces the initial guess, with a trust_region the delays are searched
+    only within that fraction around x0. returns the OptimizeResult object
+    and the scale factors.'''
     # x0 = np.array([4.0, 2.0, 0.001])  # initial guess
-    x0 = np.array([0.5, 4.0, 2.0, 15])  # initial guess including perfpot
-    load_scale_factor = calc_pp_load_scale_factor(plan)
-    perf_scale_factor = calc_pp_perf_scale_factor(real_perf_values)
-    scaled_plan = list(map(lambda l: load_scale_factor * l, plan))
-    scaled_perfs = list(map(lambda p: perf_scale_factor * p, real_perf_values))
-    args = (scaled_plan,
-            scaled_perfs,
+    if x0 is None:
+        x0 = [0.5, 4.0, 2.0, 15]  # initial guess including perfpot
+    x0 = np.array(x0)
+    problem, load_scale_factor, perf_scale_factor = \
+        pp_fitting_problem(plan, real_perf_values)
+    args = (problem,
             calc_rmse,
-            unpack_pp_parms_list,
-            pp_performance_over_time2)
+            unpack_pp_parms_list)
     bounds = [(0.0, 1.0),       # perfpot
               (0.001, 30.0),    # DS Delay of Strain Rate
               (0.001, 30.0),    # DR Delay of Response Rate
               (0.001, 30.0)]    # DSO Delay of Strain Overflow Rate
+    if trust_region is not None:
+        bounds = trust_region_bounds(x0, bounds, trust_region, free=[0])
     options = {}
     # options['maxiter'] = 50
     options['disp'] = False
@@ -125,10 +223,11 @@ def pp_minimize_fitting(plan, real_perf_values, method):
     def iter_callback(xk):
         print("current parameter vector: {}".format(xk))
 
-    optres = optimize.minimize(objective_f,
+    optres = optimize.minimize(rmse_and_gradient,
                                x0,
                                args,
                                method,
+                               jac=True,
                                bounds=bounds,
                                options=options,
                                callback=iter_callback)
@@ -137,11 +236,9 @@ def pp_minimize_fitting(plan, real_perf_values, method):
 
 def ff_cmaes_fitting(plan, real_perf_values):
     x0 = np.array([real_perf_values[0], 1.0, 30.0, 1.0, 15.0])  # initial guess
-    args = (plan,
-            real_perf_values,
+    args = (FittingProblem(ff_model, plan, real_perf_values),
             calc_rmse,
-            unpack_ff_parms_list,
-            ff_performance_over_time2)
+            unpack_ff_parms_list)
     opts = cma.CMAOptions()
     bounds = [[0.0, 0.01, 1.0, 0.01, 1.0],
               [real_perf_values[0] * 2, 5.0, 70.0, 5.0, 70.0]]
@@ -157,15 +254,8 @@ def ff_cmaes_fitting(plan, real_perf_values):
 def pp_cmaes_fitting(plan, real_perf_values):
     # x0 = np.array([4.0, 2.0, 15])  # initial guess of delays
     x0 = np.array([0.5, 4.0, 2.0, 15])  # initial guess including perfpot
-    load_scale_factor = calc_pp_load_scale_factor(plan)
-    perf_scale_factor = calc_pp_perf_scale_factor(real_perf_values)
-    scaled_plan = list(map(lambda l: load_scale_factor * l, plan))
-    scaled_perfs = list(map(lambda p: perf_scale_factor * p, real_perf_values))
-    args = (scaled_plan,
-            scaled_perfs,
-            calc_rmse,
-            unpack_pp_parms_list,
-            pp_performance_over_time2)
+    problem, load_scale_factor, perf_scale_factor = \
+        pp_fitting_problem(plan, real_perf_values)
     opts = cma.CMAOptions()
     # only optimize delays
     '''bounds = [[0.001, 0.001, 0.001],
@@ -177,7 +267,12 @@ def pp_cmaes_fitting(plan, real_perf_values):
     # opts.set('verb_disp', False)
     # opts.set('verbose', -9)
     opts.set('maxiter', 800)
-    res = cma.fmin(objective_f, x0, 0.5, args=args, options=opts)
+    # ask and tell to simulate the whole population in one batch
+    es = cma.CMAEvolutionStrategy(x0, 0.5, opts)
+    while not es.stop():
+        xs = es.ask()
+        es.tell(xs, list(pp_batch_rmse(xs, problem)))
+    res = (es.best.x, es.best.f)
     print('res[0] = {}'.format(res[0]))
     print('res[1] = {}'.format(res[1]))
     return res, load_scale_factor, perf_scale_factor
@@ -185,12 +280,10 @@ def pp_cmaes_fitting(plan, real_perf_values):
 
 def ff_lmfit_fitting(plan, real_perf_values, method='leastsq'):
     '''least squares or differential evolution fitting with bounds'''
-    real_perf_values = np.array(real_perf_values)
-    args = (plan,
-            real_perf_values,
+    problem = FittingProblem(ff_model, plan, real_perf_values)
+    args = (problem,
             calc_residuals,
-            unpack_ff_lmfit_parms,
-            ff_performance_over_time2)
+            unpack_ff_lmfit_parms)
     params = lmfit.Parameters()
     params.add(name='initial_p',
                value=real_perf_values[0],
@@ -200,17 +293,13 @@ def ff_lmfit_fitting(plan, real_perf_values, method='leastsq'):
     params.add(name='tau_1', value=30.0, min=1.00, max=70.0)
     params.add(name='k_2', value=1.0, min=0.01, max=5.0)
     params.add(name='tau_2', value=15.0, min=1.00, max=70.0)
-    lmfit.minimize(objective_f, params, method=method, args=args)
-    model_perfs = ff_performance_over_time(plan,
-                                           params['initial_p'],
-                                           params['k_1'],
-                                           params['tau_1'],
-                                           params['k_2'],
-                                           params['tau_2'])
-    model_perfs = filter_model_perfs_2_real_perfs(model_perfs, real_perf_values)
-    real_perf_values = list(filter(lambda x: x > 0.0, real_perf_values))
-    assert(len(model_perfs) == len(real_perf_values))
-    rmse = calc_rmse(real_perf_values, model_perfs)
+    if method == 'leastsq':
+        result = lmfit.minimize(objective_f, params, method=method,
+                                args=args, Dfun=residuals_jac)
+    else:
+        result = lmfit.minimize(objective_f, params, method=method, args=args)
+    params = result.params
+    rmse = problem.rmse(unpack_ff_lmfit_parms(params))
     return (params['initial_p'].value,
             params['k_1'].value,
             params['tau_1'].value,
@@ -220,36 +309,186 @@ def ff_lmfit_fitting(plan, real_perf_values, method='leastsq'):
 
 def pp_lmfit_fitting(plan, real_perf_values, method='leastsq'):
     '''least squares or differential evolution fitting with bounds'''
-    real_perf_values = np.array(real_perf_values)
-    load_scale_factor = calc_pp_load_scale_factor(plan)
-    perf_scale_factor = calc_pp_perf_scale_factor(real_perf_values)
-    scaled_plan = list(map(lambda l: load_scale_factor * l, plan))
-    scaled_perfs = list(map(lambda p: perf_scale_factor * p, real_perf_values))
-    args = (scaled_plan,
-            np.array(scaled_perfs),
+    problem, load_scale_factor, perf_scale_factor = \
+        pp_fitting_problem(plan, real_perf_values)
+    args = (problem,
             calc_residuals,
-            unpack_pp_lmfit_parms,
-            pp_performance_over_time2)
+            unpack_pp_lmfit_parms)
     params = lmfit.Parameters()
     params.add(name='perfpot', value=0.5, min=0, max=1)
     params.add(name='straindelay', value=4.0, min=0.001, max=30)
     params.add(name='responsedelay', value=2.0, min=0.001, max=30)
     params.add(name='overflowdelay', value=15, min=0.001, max=30)
-    lmfit.minimize(objective_f, params, method=method, args=args)
-    model_perfs = pp_performance_over_time(scaled_plan,
-                                           0.0,
-                                           0.0,
-                                           params['perfpot'],
-                                           params['straindelay'],
-                                           params['responsedelay'],
-                                           params['overflowdelay'])
-    model_perfs = filter_model_perfs_2_real_perfs(model_perfs, real_perf_values)
-    scaled_perfs = list(filter(lambda x: x > 0.0, scaled_perfs))
-    assert(len(model_perfs) == len(scaled_perfs))
-    rmse = calc_rmse(scaled_perfs, model_perfs)
+    if method == 'leastsq':
+        result = lmfit.minimize(objective_f, params, method=method,
+                                args=args, Dfun=residuals_jac)
+    else:
+        result = lmfit.minimize(objective_f, params, method=method, args=args)
+    params = result.params
+    rmse = problem.rmse(unpack_pp_lmfit_parms(params))
     return (((params['perfpot'].value,
             params['straindelay'].value,
             params['responsedelay'].value,
             params['overflowdelay'].value), rmse),
             load_scale_factor,
             perf_scale_factor)
+
+
+FITTING_ALGOS = ['LEAST_SQUARES', 'L-BFGS-B', 'TNC', 'SLSQP', 'CMA-ES', 'DE']
+
+
+def ff_fitting(plan, real_perf_values, algo):
+    '''Fitness Fatigue fitting with one of the FITTING_ALGOS. returns the
+    fitted (initial_p, k_1, tau_1, k_2, tau_2) and their rmse'''
+    if algo == 'LEAST_SQUARES':
+        return ff_lmfit_fitting(plan, real_perf_values)
+    elif algo == 'DE':
+        return ff_lmfit_fitting(plan, real_perf_values,
+                                'differential_evolution')
+    elif algo == 'CMA-ES':
+        res = ff_cmaes_fitting(plan, real_perf_values)
+        return tuple(res[0]), res[1]
+    # scipy minimize fitting: SLSQP, L-BFGS-B, TNC
+    optres = ff_minimize_fitting(plan, real_perf_values, algo)
+    print('optres.success {}'.format(optres.success))
+    print('optres.message {}'.format(optres.message))
+    return tuple(optres.x), optres.fun
+
+
+def pp_fitting(plan, real_perf_values, algo):
+    '''PerPot fitting with one of the FITTING_ALGOS. returns the fitted
+    (perfpot, straindelay, responsedelay, overflowdelay), their rmse on the
+    scaled values and the scale factors'''
+    if algo == 'LEAST_SQUARES':
+        res, l_scale, perf_scale = pp_lmfit_fitting(plan, real_perf_values)
+    elif algo == 'DE':
+        res, l_scale, perf_scale = \
+            pp_lmfit_fitting(plan, real_perf_values, 'differential_evolution')
+    elif algo == 'CMA-ES':
+        res, l_scale, perf_scale = pp_cmaes_fitting(plan, real_perf_values)
+    else:
+        # scipy minimize fitting: SLSQP, L-BFGS-B, TNC
+        optres, l_scale, perf_scale = \
+            pp_minimize_fitting(plan, real_perf_values, algo)
+        print('optres.success {}'.format(optres.success))
+        print('optres.message {}'.format(optres.message))
+        res = (optres.x, optres.fun)
+    return tuple(res[0]), res[1], l_scale, perf_scale
+
+
+# arguments of the portfolio runs, inherited by the forked pool processes
+_portfolio_args = None
+
+
+def _init_portfolio(fitting, plan, real_perf_values):
+    global _portfolio_args
+    _portfolio_args = (fitting, plan, real_perf_values)
+    np.random.seed()    # forked processes share the parent's random state
+
+
+def _portfolio_run(algo):
+    fitting, plan, real_perf_values = _portfolio_args
+    start_time = time.time()
+    try:
+        result = fitting(plan, real_perf_values, algo)
+    except Exception as e:
+        print('portfolio_fitting(): {} failed: {}'.format(algo, e))
+        result = None
+    return algo, result, time.time() - start_time
+
+
+def portfolio_fitting(fitting,
+                      plan,
+                      real_perf_values,
+                      algos=FITTING_ALGOS,
+                      time_budget=None):  # in seconds
+    '''runs fitting, ff_fitting or pp_fitting, with every algo concurrently
+    in its own process. algos that fail or are still running when the
+    time_budget runs out are left out. returns the algo with the lowest
+    rmse, its fitting result and a dict with the rmse and run_time of every
+    finished algo'''
+    deadline = None if time_budget is None else time.time() + time_budget
+    pool = multiprocessing.Pool(len(algos),
+                                _init_portfolio,
+                                (fitting, plan, real_perf_values))
+    best_algo, best = None, None
+    report = {}
+    try:
+        runs = pool.imap_unordered(_portfolio_run, algos)
+        for _ in algos:
+            timeout = None
+            if deadline is not None:
+                timeout = max(0.0, deadline - time.time())
+            try:
+                algo, result, run_time = runs.next(timeout)
+            except multiprocessing.TimeoutError:
+                print('portfolio_fitting(): time budget exhausted')
+                break
+            if result is None or not np.isfinite(result[1]):
+                continue
+            report[algo] = {'rmse': float(result[1]),
+                            'run_time': run_time}
+            if best is None or result[1] < best[1]:
+                best_algo, best = algo, result
+    finally:
+        pool.terminate()
+    if best is None:
+        raise RuntimeError('no fitting algorithm finished')
+    return best_algo, best, report
+
+
+def median_parameters(parameter_dicts):
+    '''the median of every parameter of the parameter dicts, e.g. of all
+    users fitted with the same metrics. None if there are none'''
+    if not parameter_dicts:
+        return None
+    return {k: float(np.median([d[k] for d in parameter_dicts]))
+            for k in parameter_dicts[0]}
+
+
+def _on_trust_bound(x, x0, trust_region, free=()):
+    '''whether a refit ended on the edge of its trust region, i.e. the new
+    data moved the parameters further than trust_region'''
+    for i, (v, v0) in enumerate(zip(x, x0)):
+        if i not in free and abs(v - v0) >= 0.99 * trust_region * abs(v0):
+            return True
+    return False
+
+
+def ff_refit(plan, real_perf_values, previous, trust_region):
+    '''warm started Fitness Fatigue fitting. the gains and time constants
+    start from the previous parameter dict, the user's last fit or the
+    median_parameters() of everyone's, and L-BFGS-B searches within the
+    trust_region fraction around them. if the fit ends on the edge of the trust
+    region, it's repeated within the full bounds. without previous
+    parameters it's a cold L-BFGS-B fit. returns like ff_fitting()'''
+    if previous is None:
+        return ff_fitting(plan, real_perf_values, 'L-BFGS-B')
+    x0 = [real_perf_values[0]] + [previous[p] for p in
+                                  ff_model.FITTED_PARAMETERS[1:]]
+    optres = ff_minimize_fitting(plan, real_perf_values, 'L-BFGS-B', x0,
+                                 trust_region)
+    if _on_trust_bound(optres.x, x0, trust_region, free=[0]):
+        print('ff_refit(): left the trust region, refit within all bounds')
+        optres = ff_minimize_fitting(plan, real_perf_values, 'L-BFGS-B',
+                                     optres.x)
+    print('ff_refit(): {} iterations'.format(optres.nit))
+    return tuple(optres.x), optres.fun
+
+
+def pp_refit(plan, real_perf_values, previous, trust_region):
+    '''warm started PerPot fitting, see ff_refit(). the delays start from
+    the previous parameter dict, the perfpot depends on the scaling of the
+    new data and starts from the initial guess. returns like pp_fitting()'''
+    if previous is None:
+        return pp_fitting(plan, real_perf_values, 'L-BFGS-B')
+    x0 = [0.5] + [previous[p] for p in pp_model.FITTED_PARAMETERS[1:]]
+    optres, l_scale, perf_scale = \
+        pp_minimize_fitting(plan, real_perf_values, 'L-BFGS-B', x0,
+                            trust_region)
+    if _on_trust_bound(optres.x, x0, trust_region, free=[0]):
+        print('pp_refit(): left the trust region, refit within all bounds')
+        optres, l_scale, perf_scale = \
+            pp_minimize_fitting(plan, real_perf_values, 'L-BFGS-B', optres.x)
+    print('pp_refit(): {} iterations'.format(optres.nit))
+    return tuple(optres.x), optres.fun, l_scale, perf_scale
@@ -1,4 +1,12 @@
 from __future__ import division
+import numpy as np
+
+# model interface: simulate(), final() and simulate_with_jacobian() take
+# parameter dicts with these keys
+PARAMETERS = ('strainpot', 'responsepot', 'perfpot', 'straindelay',
+              'responsedelay', 'overflowdelay')
+FITTED_PARAMETERS = ('perfpot', 'straindelay', 'responsedelay',
+                     'overflowdelay')
 
 
 def make_load_func(plan):
@@ -61,6 +69,168 @@ def performance_over_time2(plan, parms):
                                  parms[5])
 
 
+def performance_over_time_with_jacobian(plan, parms):
+    '''returns the performance potentials for parms = [strainpot, responsepot,
+    perfpot, straindelay, responsedelay, overflowdelay] and their partial
+    derivatives with respect to perfpot, straindelay, responsedelay and
+    overflowdelay as a (days x 4) array. the derivatives are carried through
+    the day loop along the active branch of every min and max'''
+    strainpot, responsepot, perfpot = parms[0], parms[1], parms[2]
+    straindelay, responsedelay, overflowdelay = parms[3], parms[4], parms[5]
+    n = len(plan)
+    perfpots = np.empty(n, dtype=np.double)
+    jac = np.empty((n, 4), dtype=np.double)
+    zero = [0.0, 0.0, 0.0, 0.0]
+    d_strainpot = zero
+    d_responsepot = zero
+    d_perfpot = [1.0, 0.0, 0.0, 0.0]
+
+    for day in range(n):
+        strainpot += plan[day]
+        responsepot += plan[day]
+
+        # strainrate = min(min(1, strainpot), max(0, perfpot)) / straindelay
+        if strainpot < 1:
+            strain_lim, d_strain_lim = strainpot, d_strainpot
+        else:
+            strain_lim, d_strain_lim = 1, zero
+        if perfpot > 0:
+            perf_lim, d_perf_lim = perfpot, d_perfpot
+        else:
+            perf_lim, d_perf_lim = 0, zero
+        if strain_lim <= perf_lim:
+            lim, d_lim = strain_lim, d_strain_lim
+        else:
+            lim, d_lim = perf_lim, d_perf_lim
+        strainrate = lim / straindelay
+        d_strainrate = [d / straindelay for d in d_lim]
+        d_strainrate[1] -= strainrate / straindelay
+
+        # responserate = min(min(1, responsepot), min(1, 1 - perfpot)) / ...
+        if responsepot < 1:
+            response_lim, d_response_lim = responsepot, d_responsepot
+        else:
+            response_lim, d_response_lim = 1, zero
+        if perfpot > 0:
+            perf_lim, d_perf_lim = 1 - perfpot, [-d for d in d_perfpot]
+        else:
+            perf_lim, d_perf_lim = 1, zero
+        if response_lim <= perf_lim:
+            lim, d_lim = response_lim, d_response_lim
+        else:
+            lim, d_lim = perf_lim, d_perf_lim
+        responserate = lim / responsedelay
+        d_responserate = [d / responsedelay for d in d_lim]
+        d_responserate[2] -= responserate / responsedelay
+
+        # overflowrate = max(0, strainpot - 1) / overflowdelay
+        if overflowdelay != 0 and strainpot > 1:
+            overflowrate = (strainpot - 1) / overflowdelay
+            d_overflowrate = [d / overflowdelay for d in d_strainpot]
+            d_overflowrate[3] -= overflowrate / overflowdelay
+        else:
+            overflowrate = 0
+            d_overflowrate = zero
+
+        strainpot = strainpot - strainrate - overflowrate
+        responsepot = responsepot - responserate
+        perfpot = perfpot + responserate - strainrate - overflowrate
+        d_strainpot = [a - b - c for a, b, c in
+                       zip(d_strainpot, d_strainrate, d_overflowrate)]
+        d_responsepot = [a - b for a, b in zip(d_responsepot, d_responserate)]
+        d_perfpot = [a + b - c - d for a, b, c, d in
+                     zip(d_perfpot, d_responserate, d_strainrate,
+                         d_overflowrate)]
+        perfpots[day] = perfpot
+        jac[day] = d_perfpot
+
+    return perfpots, jac
+
+
+def _soft_min(x, y, smoothing):
+    '''returns min(x, y) rounded off by smoothing and its partial derivatives
+    with respect to x and y. a smoothing of 0 is the exact min with the
+    derivatives of its active branch'''
+    q = np.sqrt((x - y) ** 2 + smoothing ** 2)
+    slope = (x - y) / q if q > 0 else 0.0
+    return (x + y - q) / 2, (1 - slope) / 2, (1 + slope) / 2
+
+
+def _soft_max(x, y, smoothing):
+    '''returns max(x, y) rounded off by smoothing and its partial
+    derivatives, see _soft_min()'''
+    q = np.sqrt((x - y) ** 2 + smoothing ** 2)
+    slope = (x - y) / q if q > 0 else 0.0
+    return (x + y + q) / 2, (1 + slope) / 2, (1 - slope) / 2
+
+
+def after_plan_with_load_gradient(plan, smoothing=0.0, **kwargs):
+    '''returns the performance potential after the plan and its gradient
+    with respect to the load of every day. the min and max of the rates are
+    rounded off by smoothing, which makes the model differentiable
+    everywhere, with 0 it is the exact model. the forward pass over the days
+    keeps the local derivatives of every day, one backward (adjoint) pass
+    accumulates the gradient'''
+    strainpot = kwargs['strainpot']
+    responsepot = kwargs['responsepot']
+    perfpot = kwargs['perfpot']
+    straindelay = kwargs['straindelay']
+    responsedelay = kwargs['responsedelay']
+    overflowdelay = kwargs['overflowdelay']
+    n = len(plan)
+    # derivatives of the rates with respect to the potentials they depend on
+    d_strainrate = np.empty((n, 2))     # by strainpot, perfpot
+    d_responserate = np.empty((n, 2))   # by responsepot, perfpot
+    d_overflowrate = np.zeros(n)        # by strainpot
+
+    for day in range(n):
+        strainpot += plan[day]
+        responsepot += plan[day]
+
+        s_lim, _, d_s_lim = _soft_min(1, strainpot, smoothing)
+        p_lim, _, d_p_lim = _soft_max(0, perfpot, smoothing)
+        lim, d_lim_s, d_lim_p = _soft_min(s_lim, p_lim, smoothing)
+        strainrate = lim / straindelay
+        d_strainrate[day] = (d_lim_s * d_s_lim / straindelay,
+                             d_lim_p * d_p_lim / straindelay)
+
+        r_lim, _, d_r_lim = _soft_min(1, responsepot, smoothing)
+        p_lim, _, d_p_lim = _soft_min(1, 1 - perfpot, smoothing)
+        lim, d_lim_r, d_lim_p = _soft_min(r_lim, p_lim, smoothing)
+        responserate = lim / responsedelay
+        d_responserate[day] = (d_lim_r * d_r_lim / responsedelay,
+                               -d_lim_p * d_p_lim / responsedelay)
+
+        if overflowdelay != 0:
+            o_lim, _, d_o_lim = _soft_max(0, strainpot - 1, smoothing)
+            overflowrate = o_lim / overflowdelay
+            d_overflowrate[day] = d_o_lim / overflowdelay
+        else:
+            overflowrate = 0
+
+        strainpot = strainpot - strainrate - overflowrate
+        responsepot = responsepot - responserate
+        perfpot = perfpot + responserate - strainrate - overflowrate
+
+    # adjoints of the potentials at the end of a day, the performance
+    # potential after the last day is the output
+    a_strain, a_response, a_perf = 0.0, 0.0, 1.0
+    gradient = np.empty(n)
+    for day in range(n - 1, -1, -1):
+        ds_s, ds_p = d_strainrate[day]
+        dr_r, dr_p = d_responserate[day]
+        do_s = d_overflowrate[day]
+        # adjoints of the potentials after the load of the day was added
+        a_s = a_strain * (1 - ds_s - do_s) + a_perf * (-ds_s - do_s)
+        a_r = a_response * (1 - dr_r) + a_perf * dr_r
+        a_perf = a_strain * -ds_p + a_response * -dr_p + \
+            a_perf * (1 + dr_p - ds_p)
+        a_strain, a_response = a_s, a_r
+        gradient[day] = a_s + a_r
+
+    return perfpot, gradient
+
+
 def leistungs_entwicklung(n,
                           strainpot,
                           responsepot,
@@ -101,6 +271,205 @@ def after_plan(plan, **kwargs):
     return e[-1]
 
 
+def after_plan_batch(plans, state=None, **kwargs):
+    '''takes a (plans x days) array and returns the performances after every
+    plan and the total workloads of the plans. with a state from
+    prequel_state() the plans are continued from the end of the prequel'''
+    if state is not None:
+        kwargs = dict(kwargs, **state)
+    plans = np.atleast_2d(np.asarray(plans, dtype=np.double))
+    _, _, perfpots = potentials_after_plan_batch(plans,
+                                                 kwargs['strainpot'],
+                                                 kwargs['responsepot'],
+                                                 kwargs['perfpot'],
+                                                 kwargs['straindelay'],
+                                                 kwargs['responsedelay'],
+                                                 kwargs['overflowdelay'])
+    return perfpots[:, 0], plans.sum(axis=1)
+
+
+def potentials_after_plan(plan,
+                          strainpot,
+                          responsepot,
+                          perfpot,
+                          straindelay,
+                          responsedelay,
+                          overflowdelay):
+    '''returns the strain, response and performance potentials after the
+    last day of the plan'''
+    for load in plan:
+        strainpot += load
+        responsepot += load
+
+        strainrate = calc_strainrate(strainpot, perfpot, straindelay)
+        responserate = calc_responserate(responsepot, perfpot, responsedelay)
+        if overflowdelay != 0:
+            overflowrate = calc_overflowrate(strainpot, overflowdelay)
+        else:
+            overflowrate = 0
+
+        strainpot = strainpot - strainrate - overflowrate
+        responsepot = responsepot - responserate
+        perfpot = perfpot + responserate - strainrate - overflowrate
+
+    return strainpot, responsepot, perfpot
+
+
+def simulate_batch(plans,
+                   strainpot,
+                   responsepot,
+                   perfpot,
+                   straindelay,
+                   responsedelay,
+                   overflowdelay,
+                   keep_perfpots=True):
+    '''simulates every plan of a (plans x days) array with every parameter set
+    at once. the parameters are scalars or 1-D arrays with one entry per
+    parameter set. only the loop over the days is done in python, the
+    potentials are (plans x parameter sets) arrays. returns the potentials
+    after the last day and, if keep_perfpots, the performance potentials of
+    every day as a (plans x parameter sets x days) array'''
+    plans = np.atleast_2d(np.asarray(plans, dtype=np.double))
+    straindelay, responsedelay, overflowdelay = \
+        np.broadcast_arrays(np.atleast_1d(straindelay),
+                            np.atleast_1d(responsedelay),
+                            np.atleast_1d(overflowdelay))
+    shape = (len(plans), len(straindelay))
+    strainpot = np.zeros(shape) + strainpot
+    responsepot = np.zeros(shape) + responsepot
+    perfpot = np.zeros(shape) + perfpot
+    # an overflowdelay of 0 disables the overflow
+    overflow_on = overflowdelay != 0
+    overflowdelay = np.where(overflow_on, overflowdelay, 1.0)
+    n = plans.shape[1]
+    perfpots = np.empty(shape + (n,)) if keep_perfpots else None
+
+    for day in range(n):
+        load = plans[:, day, np.newaxis]
+        strainpot += load
+        responsepot += load
+
+        strainrate = np.minimum(np.minimum(1, strainpot),
+                                np.maximum(0, perfpot)) / straindelay
+        responserate = np.minimum(np.minimum(1, responsepot),
+                                  np.minimum(1, 1 - perfpot)) / responsedelay
+        overflowrate = np.where(overflow_on,
+                                np.maximum(0, strainpot - 1) / overflowdelay,
+                                0.0)
+
+        strainpot = strainpot - strainrate - overflowrate
+        responsepot = responsepot - responserate
+        perfpot = perfpot + responserate - strainrate - overflowrate
+        if keep_perfpots:
+            perfpots[:, :, day] = perfpot
+
+    return (strainpot, responsepot, perfpot), perfpots
+
+
+def performance_over_time_batch(plans,
+                                strainpot,
+                                responsepot,
+                                perfpot,
+                                straindelay,
+                                responsedelay,
+                                overflowdelay):
+    '''returns the performance potentials of every day for every plan and
+    parameter set as a (plans x parameter sets x days) array'''
+    return simulate_batch(plans,
+                          strainpot,
+                          responsepot,
+                          perfpot,
+                          straindelay,
+                          responsedelay,
+                          overflowdelay)[1]
+
+
+def potentials_after_plan_batch(plans,
+                                strainpot,
+                                responsepot,
+                                perfpot,
+                                straindelay,
+                                responsedelay,
+                                overflowdelay):
+    '''returns the strain, response and performance potentials after the last
+    day as (plans x parameter sets) arrays'''
+    return simulate_batch(plans,
+                          strainpot,
+                          responsepot,
+                          perfpot,
+                          straindelay,
+                          responsedelay,
+                          overflowdelay,
+                          keep_perfpots=False)[0]
+
+
+def prequel_state(prequel_plan, **kwargs):
+    '''simulates the prequel plan once and returns the model state at the end
+    of its last day. the state replaces the initial potentials of the model
+    parameters'''
+    strainpot, responsepot, perfpot = \
+        potentials_after_plan(prequel_plan,
+                              kwargs['strainpot'],
+                              kwargs['responsepot'],
+                              kwargs['perfpot'],
+                              kwargs['straindelay'],
+                              kwargs['responsedelay'],
+                              kwargs['overflowdelay'])
+    return {'strainpot': strainpot,
+            'responsepot': responsepot,
+            'perfpot': perfpot}
+
+
+def after_plan_from_state(plan, state, **kwargs):
+    '''returns the performance after the plan continued from the given
+    prequel_state(). equals after_plan(prequel_plan + plan)'''
+    return after_plan(plan, **dict(kwargs, **state))
+
+
+def _single_plan(plans, params):
+    '''returns the plan as a list if plans is a single plan and params a
+    single parameter set, otherwise None. the scalar loop simulates one plan
+    faster than the batch kernel'''
+    plans = np.asarray(plans, dtype=np.double)
+    if plans.ndim > 2 or (plans.ndim == 2 and len(plans) != 1):
+        return None
+    if any(np.ndim(params[p]) > 0 for p in PARAMETERS):
+        return None
+    return plans.reshape(-1).tolist()
+
+
+def simulate(plans, params):
+    '''model interface: returns the performance potential curves of a
+    (plans x days) array as a (plans x days) array'''
+    plan = _single_plan(plans, params)
+    if plan is not None:
+        return np.array([performance_over_time(plan,
+                                               *[params[p]
+                                                 for p in PARAMETERS])])
+    return performance_over_time_batch(plans,
+                                       *[params[p] for p in PARAMETERS])[:, 0]
+
+
+def final(plans, params, state=None):
+    '''model interface: returns the performance potentials after every plan
+    of a (plans x days) array, optionally continued from a prequel_state()'''
+    if state is not None:
+        params = dict(params, **state)
+    plan = _single_plan(plans, params)
+    if plan is not None:
+        return np.array([potentials_after_plan(plan,
+                                               *[params[p]
+                                                 for p in PARAMETERS])[2]])
+    return after_plan_batch(plans, **params)[0]
+
+
+def simulate_with_jacobian(plan, params):
+    '''model interface: returns the performance potential curve of a single
+    plan and its derivatives with respect to the FITTED_PARAMETERS'''
+    return performance_over_time_with_jacobian(plan,
+                                               [params[p] for p in PARAMETERS])
+
+
 def calc_pp_load_scale_factor(values):
     '''calculate the PerPot scale factor for load values'''
     return 1 / (max(values) * 1.25)
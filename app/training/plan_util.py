@@ -2,6 +2,7 @@ from enum import Enum, unique
 from itertools import islice, takewhile
 from math import sqrt
 from datetime import date, datetime, timedelta
+import numpy as np
 
 WORKLOAD_FACTOR = 0.001
 
@@ -66,6 +67,27 @@ def fitness(plan, goal, threshold, model_perf_func, **model_parameters):
     return fitness_with_load, se_threshold
 
 
+def fitness_batch(plans, goal, threshold, model, model_parameters, state=None):
+    """same as fitness() but for a (plans x days) array and a model module
+    implementing final(). state is an optional prequel_state() of the model.
+    returns a tuple of arrays of fitness scores and threshold booleans
+    """
+    plans = np.atleast_2d(np.asarray(plans, dtype=np.double))
+    plan_perfs = model.final(plans, model_parameters, state)
+    return fitness_from_perfs(plan_perfs, plans.sum(axis=1), goal, threshold)
+
+
+def fitness_from_perfs(plan_perfs, total_workloads, goal, threshold):
+    """same as fitness_batch() but for arrays of already calculated
+    performances after and total workloads of the plans
+    """
+    fitness_wo_load = 1 - (abs(goal - plan_perfs))
+    fitness_with_load = fitness_wo_load - WORKLOAD_FACTOR * total_workloads
+    approx_deviations = abs(100 - (plan_perfs / goal) * 100)
+    se_thresholds = approx_deviations <= threshold
+    return fitness_with_load, se_thresholds
+
+
 def approximation_quality(plan_perf, goal):
     if plan_perf < goal:
         return (plan_perf / goal) * 100
@@ -182,6 +204,40 @@ def acc_small_loads(plan, threshold_fac=0.1, max_load=None):
     return plan_new
 
 
+def adapt_plan(loads, weeks, training_days, max_load, min_load):
+    """maps the loads of a stored plan onto a new plan of weeks weeks. every
+    training day takes the load of the same weekday in the proportionally
+    corresponding old week, or the mean load of that week if it was an
+    off-day before. off-days are 0.0 and loads are clamped to the bounds"""
+    loads = np.asarray(loads, dtype=np.double)
+    old_weeks = max(len(loads) // 7, 1)
+    old = np.resize(loads, old_weeks * 7).reshape(old_weeks, 7)
+    plan = np.zeros(weeks * 7)
+    for i in training_days:
+        week = old[(i // 7) * old_weeks // weeks]
+        load = week[i % 7]
+        if load <= 0.0:
+            loaded = week[week > 0.0]
+            load = loaded.mean() if len(loaded) else min_load
+        plan[i] = min(max(load, min_load), max_load)
+    return plan
+
+
+def plan_distance(parms, other_parms, weeks, other_weeks, weekly_cycle,
+                  other_weekly_cycle, goal_ratio, other_goal_ratio):
+    """dissimilarity of two plan requests by model parameters, length,
+    weekly cycle and goal / start performance ratio. 0.0 means equal"""
+    parms_d = np.mean([abs(parms[k] - other_parms[k]) /
+                       max(abs(parms[k]), abs(other_parms[k]), 1e-9)
+                       for k in parms])
+    length_d = abs(np.log(weeks / other_weeks))
+    cycle, other_cycle = set(weekly_cycle), set(other_weekly_cycle)
+    union = cycle | other_cycle
+    cycle_d = 1 - len(cycle & other_cycle) / len(union) if union else 0.0
+    goal_d = abs(goal_ratio - other_goal_ratio)
+    return parms_d + length_d + cycle_d + goal_d
+
+
 def parse_comma_separated_ints(field_string):
     '''returns a list of ints for a string like "1, 2, 3"'''
     if len(field_string) > 0:
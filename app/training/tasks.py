@@ -1,22 +1,23 @@
-import numpy as np
 import sys
 import time
+from flask import current_app
 
 from .. import celeryapp
 from .. import db
 from ..models import User, FFParameters, PPParameters, FFPlan, PPPlan
 from ..models import PendingJob, JobType
 from ..email import send_email
-from .parameterfitting import ff_minimize_fitting, pp_minimize_fitting
-from .parameterfitting import ff_cmaes_fitting, pp_cmaes_fitting
-from .parameterfitting import ff_lmfit_fitting, pp_lmfit_fitting
+from .parameterfitting import ff_fitting, pp_fitting, portfolio_fitting
+from .parameterfitting import ff_refit, pp_refit, median_parameters
 from .fitting_util import plan_perfs_from_dic
 from .fitting_util import choose_init_p
 from .fitting_util import filter_model_perfs_2_real_perfs, calc_rmse
 from .cmaes_planning import genplan as cmaes_genplan
-from .cmaes_planning import genplan_de
-from .cmaes_planning import genplan_minimize
-from .differentialevolution import differential_evolution
+from .cmaes_planning import genplan_restarts
+from .lp_planning import genplan as lp_genplan
+from .gradient_planning import genplan as gradient_genplan
+from .differentialevolution import parallel_restarts
+from .differentialevolution import island_differential_evolution
 from .differentialevolution import POP_SIZE, GOOD_ENOUGH_THRES
 from .perpot import performance_over_time as pp_performance_over_time
 from . import fitnessfatigue as ff_model
@@ -57,45 +58,32 @@ def ff_fitting_task(user_id, load_metric, perf_metric, algo):
         print('ff_fitting_task() algo = {} load_metric = {}'.
               format(algo, load_metric))
         start_time = int(time.time())
-        if algo == 'LEAST_SQUARES':
-            # lmfit fitting, defaults to least squares
-            optres = ff_lmfit_fitting(plan, perfs)
-            initial_p = optres[0][0]
-            k_1 = optres[0][1]
-            tau_1 = optres[0][2]
-            k_2 = optres[0][3]
-            tau_2 = optres[0][4]
-            rmse = optres[1]
-        elif algo == 'DE':
-            optres = ff_lmfit_fitting(plan, perfs, 'differential_evolution')
-            initial_p = optres[0][0]
-            k_1 = optres[0][1]
-            tau_1 = optres[0][2]
-            k_2 = optres[0][3]
-            tau_2 = optres[0][4]
-            rmse = optres[1]
-        elif algo == 'CMA-ES':
-            # cmaes fitting
-            optres = ff_cmaes_fitting(plan, perfs)
-            initial_p = optres[0][0]
-            k_1 = optres[0][1]
-            tau_1 = optres[0][2]
-            k_2 = optres[0][3]
-            tau_2 = optres[0][4]
-            rmse = optres[1]
+        if algo == 'PORTFOLIO':
+            algo, optres, fitting_report = portfolio_fitting(
+                ff_fitting,
+                plan,
+                perfs,
+                time_budget=current_app.config.get('FITTING_TIME_BUDGET'))
+        elif algo == 'REFIT':
+            previous = _previous_parameters(user.ff_parameters.first(),
+                                            FFParameters,
+                                            load_metric,
+                                            perf_metric)
+            optres = ff_refit(plan,
+                              perfs,
+                              previous,
+                              current_app.config['REFIT_TRUST_REGION'])
+            fitting_report = None
         else:
-            # scipy minimize fitting: SLSQP, L-BFGS-B, TNC
-            optres = ff_minimize_fitting(plan, perfs, algo)
-            print('optres.success {}'.format(optres.success))
-            print('optres.message {}'.format(optres.message))
-            initial_p = optres.x[0]
-            k_1 = optres.x[1]
-            tau_1 = optres.x[2]
-            k_2 = optres.x[3]
-            tau_2 = optres.x[4]
-            rmse = optres.fun
+            optres = ff_fitting(plan, perfs, algo)
+            fitting_report = None
+        initial_p, k_1, tau_1, k_2, tau_2 = optres[0]
+        rmse = optres[1]
 
         run_time = int(time.time()) - start_time
+        if fitting_report is None:
+            fitting_report = {algo: {'rmse': float(rmse),
+                                     'run_time': run_time}}
 
         # if plan_since_min_p isn't the fitting plan, choose min_p as init_p
         if len(plan_since_min_p) < len(plan):
@@ -111,6 +99,8 @@ def ff_fitting_task(user_id, load_metric, perf_metric, algo):
                                load_metric=load_metric,
                                perf_metric=perf_metric,
                                plan_since_initial_p=plan_since_min_p,
+                               fitting_algo=algo,
+                               fitting_report=fitting_report,
                                owner_id=user_id)
     except:
         print('ff_fitting_task(): {}'.format(sys.exc_info()))
@@ -131,7 +121,8 @@ def ff_fitting_task(user_id, load_metric, perf_metric, algo):
                ffparms=ffparms,
                fmin=rmse,
                runtime=run_time,
-               algo=algo)
+               algo=algo,
+               fitting_report=fitting_report)
     return
 
 
@@ -167,41 +158,32 @@ def pp_fitting_task(user_id, load_metric, perf_metric, algo):
     try:
         print('pp_fitting_task() algo = {}'.format(algo))
         start_time = int(time.time())
-        if algo == 'LEAST_SQUARES':
-            # lmfit fitting, defaults to least squares
-            optres, l_scale, perf_scale = pp_lmfit_fitting(plan, perfs)
-            perfpot = optres[0][0]
-            straindelay = optres[0][1]
-            responsedelay = optres[0][2]
-            overflowdelay = optres[0][3]
-            rmse = optres[1]
-        elif algo == 'DE':
-            optres, l_scale, perf_scale = \
-                pp_lmfit_fitting(plan, perfs, 'differential_evolution')
-            perfpot = optres[0][0]
-            straindelay = optres[0][1]
-            responsedelay = optres[0][2]
-            overflowdelay = optres[0][3]
-            rmse = optres[1]
-        elif algo == 'CMA-ES':
-            optres, l_scale, perf_scale = pp_cmaes_fitting(plan, perfs)
-            perfpot = optres[0][0]
-            straindelay = optres[0][1]
-            responsedelay = optres[0][2]
-            overflowdelay = optres[0][3]
-            rmse = optres[1]
+        if algo == 'PORTFOLIO':
+            algo, optres, fitting_report = portfolio_fitting(
+                pp_fitting,
+                plan,
+                perfs,
+                time_budget=current_app.config.get('FITTING_TIME_BUDGET'))
+        elif algo == 'REFIT':
+            previous = _previous_parameters(user.pp_parameters.first(),
+                                            PPParameters,
+                                            load_metric,
+                                            perf_metric)
+            optres = pp_refit(plan,
+                              perfs,
+                              previous,
+                              current_app.config['REFIT_TRUST_REGION'])
+            fitting_report = None
         else:
-            # scipy minimize fitting: SLSQP, L-BFGS-B, TNC
-            optres, l_scale, perf_scale = pp_minimize_fitting(plan, perfs, algo)
-            print('optres.success {}'.format(optres.success))
-            print('optres.message {}'.format(optres.message))
-            perfpot = optres.x[0]
-            straindelay = optres.x[1]
-            responsedelay = optres.x[2]
-            overflowdelay = optres.x[3]
-            rmse = optres.fun
+            optres = pp_fitting(plan, perfs, algo)
+            fitting_report = None
+        perfpot, straindelay, responsedelay, overflowdelay = optres[0]
+        rmse, l_scale, perf_scale = optres[1:]
 
         run_time = int(time.time()) - start_time
+        if fitting_report is None:
+            fitting_report = {algo: {'rmse': float(rmse),
+                                     'run_time': run_time}}
 
         # unscaled rmse calculation
         scaled_plan = list(map(lambda l: l_scale * l, plan))
@@ -238,6 +220,8 @@ def pp_fitting_task(user_id, load_metric, perf_metric, algo):
                                load_metric=load_metric,
                                perf_metric=perf_metric,
                                plan_since_initial_pp=plan_since_min_p,
+                               fitting_algo=algo,
+                               fitting_report=fitting_report,
                                owner_id=user_id)
     except:
         print('pp_fitting_task(): {}'.format(sys.exc_info()))
@@ -259,440 +243,43 @@ def pp_fitting_task(user_id, load_metric, perf_metric, algo):
                fmin=rmse,
                runtime=run_time,
                algo=algo,
+               fitting_report=fitting_report,
                unscaled_rmse=unscaled_rmse)
     return
 
 
 @celeryapp.task()
 def ff_genplan_task(user_id, plan_req):
-    user = User.query.get(user_id)
-    if user is None:
-        print('ff_genplan_task(): no User with user_id {}'.format(user_id))
-        return
-    if user.has_pending_jobs(JobType.ff_genplan):
-        print('ff_genplan_task(): User {} has already pending job '
-              'of type ff_genplan'.format(user_id))
-        return
-    if plan_req.model_parms is None:
-        print('ff_genplan_task(): User {} has no ff_parameters'.format(user_id))
-        return
-
-    job = PendingJob(owner_id=user_id, job_type=JobType.ff_genplan)
-    db.session.add(job)
-    db.session.commit()
-
-    ff_args = plan_req.model_parms.to_dict()
-    prequel_plan = plan_req.model_parms.plan_since_initial_p_till_next_monday()
-    print('ff_genplan_task(): prequel_plan till monday {}'.format(prequel_plan))
-    training_days = u.microcycle_days(plan_req.weekly_cycle,
-                                      plan_req.length)
-    training_days = u.filter_weeks(training_days, plan_req.off_weeks)
-    training_days = u.filter_days(training_days, plan_req.off_days)
-
-    runs = 0
-    devisors_to_try = [10, 6, 3, 1]
-    pop_init_divisor = devisors_to_try[0]
-    best_solution = None
-    best_solution_fitness = (-sys.float_info.max, False)
-    best_perf_after_plan = 0
-    while(not best_solution_fitness[1]):
-        solution = differential_evolution(plan_req.length,
-                                          plan_req.goal,
-                                          training_days,
-                                          POP_SIZE,
-                                          plan_req.max_load,
-                                          plan_req.min_load,
-                                          ff_model.after_plan,
-                                          prequel_plan=prequel_plan,
-                                          pp_func=u.sort_loads,
-                                          recomb_weight=0.7,
-                                          scale_factor=None,    # dither
-                                          pop_init_divisor=pop_init_divisor,
-                                          **ff_args)
-        prequel_plan_solution = np.concatenate((prequel_plan, solution))
-        solution_fitness = u.fitness(prequel_plan_solution,
-                                     plan_req.goal,
-                                     GOOD_ENOUGH_THRES,
-                                     ff_model.after_plan,
-                                     **ff_args)
-        perf_after_plan = ff_model.after_plan(prequel_plan_solution, **ff_args)
-        u.print_ea_result(solution,
-                          solution_fitness,
-                          perf_after_plan,
-                          plan_req.goal)
-        if solution_fitness[0] > best_solution_fitness[0]:
-            best_solution_fitness = solution_fitness
-            best_solution = solution.copy()
-            best_perf_after_plan = perf_after_plan
-        runs += 1
-        if runs < len(devisors_to_try):
-            pop_init_divisor = devisors_to_try[runs]
-        else:
-            break
-
-    weekly_cycle_vals = list(map(lambda d: d.value, plan_req.weekly_cycle))
-    ffplan = FFPlan(name=plan_req.name,
-                    start_date=plan_req.start_date,
-                    start_perf=plan_req.start_perf,
-                    end_perf=best_perf_after_plan,
-                    loads=best_solution,
-                    initial_p=plan_req.model_parms.initial_p,
-                    k_1=plan_req.model_parms.k_1,
-                    tau_1=plan_req.model_parms.tau_1,
-                    k_2=plan_req.model_parms.k_2,
-                    tau_2=plan_req.model_parms.tau_2,
-                    load_metric=plan_req.model_parms.load_metric,
-                    perf_metric=plan_req.model_parms.perf_metric,
-                    prequel_plan=prequel_plan,
-                    goal=plan_req.goal,
-                    length=plan_req.length,
-                    max_load=plan_req.max_load,
-                    min_load=plan_req.min_load,
-                    off_weeks=plan_req.off_weeks,
-                    off_days=plan_req.off_days,
-                    weekly_cycle=weekly_cycle_vals,
-                    owner_id=user.id)
-    db.session.add(ffplan)
-    db.session.delete(job)
-    db.session.commit()
-
-    approx_quality = u.approximation_quality(best_perf_after_plan,
-                                             plan_req.goal)
-    send_email(user.email,
-               'fitness fatigue plan generation done',
-               '/training/email/plangen_done_email',
-               user=user,
-               model='Fitness Fatigue',
-               approx_quality=approx_quality,
-               below_threshold=solution_fitness[1],
-               plan=ffplan)
-    return
+    _genplan_job('ff_genplan_task', user_id, plan_req, ff_model, _de_genplan)
 
 
 @celeryapp.task()
 def pp_genplan_task(user_id, plan_req):
-    user = User.query.get(user_id)
-    if user is None:
-        print('pp_genplan_task(): no User with user_id {}'.format(user_id))
-        return
-    if user.has_pending_jobs(JobType.pp_genplan):
-        print('pp_genplan_task(): User {} has already pending job '
-              'of type pp_genplan'.format(user_id))
-        return
-    if plan_req.model_parms is None:
-        print('pp_genplan_task(): User {} has no pp_parameters'.format(user_id))
-        return
-
-    job = PendingJob(owner_id=user_id, job_type=JobType.pp_genplan)
-    db.session.add(job)
-    db.session.commit()
-
-    pp_args = plan_req.model_parms.to_dict()
-    prequel_plan = \
-        plan_req.model_parms.plan_since_initial_pp_till_next_monday()
-    print('pp_genplan_task(): prequel_plan till monday {}'.format(prequel_plan))
-    training_days = u.microcycle_days(plan_req.weekly_cycle,
-                                      plan_req.length)
-    training_days = u.filter_weeks(training_days, plan_req.off_weeks)
-    training_days = u.filter_days(training_days, plan_req.off_days)
-
-    runs = 0
-    devisors_to_try = [10, 6, 3, 1]
-    pop_init_divisor = devisors_to_try[0]
-    best_solution = None
-    best_solution_fitness = (-sys.float_info.max, False)
-    best_perf_after_plan = 0
-    while(not best_solution_fitness[1]):
-        print('best_solution_fitness[1] = {}'.format(best_solution_fitness[1]))
-        solution = differential_evolution(plan_req.length,
-                                          plan_req.goal,
-                                          training_days,
-                                          POP_SIZE,
-                                          plan_req.max_load,
-                                          plan_req.min_load,
-                                          pp_model.after_plan,
-                                          prequel_plan=prequel_plan,
-                                          pp_func=u.sort_loads,
-                                          recomb_weight=0.7,
-                                          scale_factor=None,    # dither
-                                          pop_init_divisor=pop_init_divisor,
-                                          **pp_args)
-        prequel_plan_solution = np.concatenate((prequel_plan, solution))
-        solution_fitness = u.fitness(prequel_plan_solution,
-                                     plan_req.goal,
-                                     GOOD_ENOUGH_THRES,
-                                     pp_model.after_plan,
-                                     **pp_args)
-        perf_after_plan = pp_model.after_plan(prequel_plan_solution, **pp_args)
-        u.print_ea_result(solution,
-                          solution_fitness,
-                          perf_after_plan,
-                          plan_req.goal)
-        if solution_fitness[0] > best_solution_fitness[0]:
-            print('new best_solution_fitness {}'.format(solution_fitness[0]))
-            best_solution_fitness = solution_fitness
-            best_solution = solution.copy()
-            best_perf_after_plan = perf_after_plan
-        runs += 1
-        if runs < len(devisors_to_try):
-            pop_init_divisor = devisors_to_try[runs]
-        else:
-            break
-
-    weekly_cycle_vals = list(map(lambda d: d.value, plan_req.weekly_cycle))
-    ppplan = PPPlan(name=plan_req.name,
-                    start_date=plan_req.start_date,
-                    start_perf=plan_req.start_perf,
-                    end_perf=best_perf_after_plan,
-                    loads=best_solution,
-                    strainpot=plan_req.model_parms.strainpot,
-                    responsepot=plan_req.model_parms.responsepot,
-                    perfpot=plan_req.model_parms.perfpot,
-                    straindelay=plan_req.model_parms.straindelay,
-                    responsedelay=plan_req.model_parms.responsedelay,
-                    overflowdelay=plan_req.model_parms.overflowdelay,
-                    load_scale_factor=plan_req.model_parms.load_scale_factor,
-                    perf_scale_factor=plan_req.model_parms.perf_scale_factor,
-                    load_metric=plan_req.model_parms.load_metric,
-                    perf_metric=plan_req.model_parms.perf_metric,
-                    prequel_plan=prequel_plan,
-                    goal=plan_req.goal,
-                    length=plan_req.length,
-                    max_load=plan_req.max_load,
-                    min_load=plan_req.min_load,
-                    off_weeks=plan_req.off_weeks,
-                    off_days=plan_req.off_days,
-                    weekly_cycle=weekly_cycle_vals,
-                    owner_id=user.id)
-    db.session.add(ppplan)
-    db.session.delete(job)
-    db.session.commit()
-
-    approx_quality = u.approximation_quality(best_perf_after_plan,
-                                             plan_req.goal)
-    send_email(user.email,
-               'perpot plan generation done',
-               '/training/email/plangen_done_email',
-               user=user,
-               model='PerPot',
-               approx_quality=approx_quality,
-               below_threshold=best_solution_fitness[1],
-               plan=ppplan)
-    return
+    _genplan_job('pp_genplan_task', user_id, plan_req, pp_model, _de_genplan)
 
 
 @celeryapp.task()
 def ff_genplan_cmaes_task(user_id, plan_req):
-    user = User.query.get(user_id)
-    if user is None:
-        print('ff_genplan_cmaes_task(): no User with user_id {}'.
-              ormat(user_id))
-        return
-    if user.has_pending_jobs(JobType.ff_genplan):
-        print('ff_genplan_cmaes_task(): User {} has already pending job '
-              'of type ff_genplan'.format(user_id))
-        return
-    if plan_req.model_parms is None:
-        print('ff_genplan_task(): User {} has no ff_parameters'.format(user_id))
-        return
-
-    job = PendingJob(owner_id=user_id, job_type=JobType.ff_genplan)
-    db.session.add(job)
-    db.session.commit()
+    _genplan_job('ff_genplan_cmaes_task', user_id, plan_req, ff_model,
+                 _cmaes_genplan)
 
-    ff_args = plan_req.model_parms.to_dict()
-    prequel_plan = \
-        plan_req.model_parms.plan_since_initial_p_till_next_monday()
-    print('ff_genplan_cmaes_task(): prequel_plan till monday {}'.
-          format(prequel_plan))
-    training_days = u.microcycle_days(plan_req.weekly_cycle,
-                                      plan_req.length)
-    training_days = u.filter_weeks(training_days, plan_req.off_weeks)
-    training_days = u.filter_days(training_days, plan_req.off_days)
-
-    '''solution = genplan_minimize(plan_req.length,
-                                plan_req.goal,
-                                training_days,
-                                plan_req.max_load,
-                                ff_model.after_plan,
-                                prequel_plan=prequel_plan,
-                                pp_func=u.sort_loads,
-                                **ff_args).x
-    solution = list(solution)'''
-
-    solution = cmaes_genplan(plan_req.length,
-                             plan_req.goal,
-                             training_days,
-                             plan_req.max_load,
-                             ff_model.after_plan,
-                             prequel_plan=prequel_plan,
-                             pp_func=u.sort_loads,
-                             **ff_args)
-    '''
-    solution = genplan_de(plan_req.length,
-                          plan_req.goal,
-                          training_days,
-                          plan_req.max_load,
-                          ff_model.after_plan,
-                          prequel_plan=prequel_plan,
-                          pp_func=u.sort_loads,
-                          **ff_args)'''
-
-    solution_fitness = u.fitness(prequel_plan + solution,
-                                 plan_req.goal,
-                                 GOOD_ENOUGH_THRES,
-                                 ff_model.after_plan,
-                                 **ff_args)
-    perf_after_plan = ff_model.after_plan(prequel_plan + solution, **ff_args)
-    u.print_ea_result(solution,
-                      solution_fitness,
-                      perf_after_plan,
-                      plan_req.goal)
-
-    weekly_cycle_vals = list(map(lambda d: d.value, plan_req.weekly_cycle))
-    ffplan = FFPlan(name=plan_req.name,
-                    start_date=plan_req.start_date,
-                    start_perf=plan_req.start_perf,
-                    end_perf=perf_after_plan,
-                    loads=solution,
-                    initial_p=plan_req.model_parms.initial_p,
-                    k_1=plan_req.model_parms.k_1,
-                    tau_1=plan_req.model_parms.tau_1,
-                    k_2=plan_req.model_parms.k_2,
-                    tau_2=plan_req.model_parms.tau_2,
-                    load_metric=plan_req.model_parms.load_metric,
-                    perf_metric=plan_req.model_parms.perf_metric,
-                    prequel_plan=prequel_plan,
-                    goal=plan_req.goal,
-                    length=plan_req.length,
-                    max_load=plan_req.max_load,
-                    min_load=plan_req.min_load,
-                    off_weeks=plan_req.off_weeks,
-                    off_days=plan_req.off_days,
-                    weekly_cycle=weekly_cycle_vals,
-                    owner_id=user.id)
-    db.session.add(ffplan)
-    db.session.delete(job)
-    db.session.commit()
-
-    approx_quality = u.approximation_quality(perf_after_plan, plan_req.goal)
-    send_email(user.email,
-               'fitness fatigue plan generation done',
-               '/training/email/plangen_done_email',
-               user=user,
-               model='Fitness Fatigue',
-               approx_quality=approx_quality,
-               below_threshold=solution_fitness[1],
-               plan=ffplan)
-    return
 
+@celeryapp.task()
+def ff_genplan_lp_task(user_id, plan_req):
+    _genplan_job('ff_genplan_lp_task', user_id, plan_req, ff_model,
+                 _lp_genplan)
 
 
 @celeryapp.task()
 def pp_genplan_cmaes_task(user_id, plan_req):
-    user = User.query.get(user_id)
-    if user is None:
-        print('pp_genplan_task(): no User with user_id {}'.format(user_id))
-        return
-    if user.has_pending_jobs(JobType.pp_genplan):
-        print('pp_genplan_task(): User {} has already pending job '
-              'of type pp_genplan'.format(user_id))
-        return
-    if plan_req.model_parms is None:
-        print('pp_genplan_task(): User {} has no pp_parameters'.format(user_id))
-        return
-
-    job = PendingJob(owner_id=user_id, job_type=JobType.pp_genplan)
-    db.session.add(job)
-    db.session.commit()
+    _genplan_job('pp_genplan_cmaes_task', user_id, plan_req, pp_model,
+                 _cmaes_genplan)
 
-    pp_args = plan_req.model_parms.to_dict()
-    prequel_plan = \
-        plan_req.model_parms.plan_since_initial_pp_till_next_monday()
-    print('pp_genplan_task(): prequel_plan till monday {}'.format(prequel_plan))
-    training_days = u.microcycle_days(plan_req.weekly_cycle,
-                                      plan_req.length)
-    training_days = u.filter_weeks(training_days, plan_req.off_weeks)
-    training_days = u.filter_days(training_days, plan_req.off_days)
-
-    '''solution = genplan_minimize(plan_req.length,
-                                plan_req.goal,
-                                training_days,
-                                plan_req.max_load,
-                                pp_model.after_plan,
-                                prequel_plan=prequel_plan,
-                                pp_func=u.sort_loads,
-                                **pp_args).x
-    solution = list(solution)'''
-
-    solution = cmaes_genplan(plan_req.length,
-                             plan_req.goal,
-                             training_days,
-                             plan_req.max_load,
-                             pp_model.after_plan,
-                             prequel_plan=prequel_plan,
-                             pp_func=u.sort_loads,
-                             **pp_args)
-    '''
-    solution = genplan_de(plan_req.length,
-                          plan_req.goal,
-                          training_days,
-                          plan_req.max_load,
-                          pp_model.after_plan,
-                          prequel_plan=prequel_plan,
-                          pp_func=u.sort_loads,
-                          **pp_args)'''
 
-    solution_fitness = u.fitness(prequel_plan + solution,
-                                 plan_req.goal,
-                                 GOOD_ENOUGH_THRES,
-                                 pp_model.after_plan,
-                                 **pp_args)
-    perf_after_plan = pp_model.after_plan(prequel_plan + solution, **pp_args)
-    u.print_ea_result(solution,
-                      solution_fitness,
-                      perf_after_plan,
-                      plan_req.goal)
-
-    weekly_cycle_vals = list(map(lambda d: d.value, plan_req.weekly_cycle))
-    ppplan = PPPlan(name=plan_req.name,
-                    start_date=plan_req.start_date,
-                    start_perf=plan_req.start_perf,
-                    end_perf=perf_after_plan,
-                    loads=solution,
-                    strainpot=plan_req.model_parms.strainpot,
-                    responsepot=plan_req.model_parms.responsepot,
-                    perfpot=plan_req.model_parms.perfpot,
-                    straindelay=plan_req.model_parms.straindelay,
-                    responsedelay=plan_req.model_parms.responsedelay,
-                    overflowdelay=plan_req.model_parms.overflowdelay,
-                    load_scale_factor=plan_req.model_parms.load_scale_factor,
-                    perf_scale_factor=plan_req.model_parms.perf_scale_factor,
-                    load_metric=plan_req.model_parms.load_metric,
-                    perf_metric=plan_req.model_parms.perf_metric,
-                    prequel_plan=prequel_plan,
-                    goal=plan_req.goal,
-                    length=plan_req.length,
-                    max_load=plan_req.max_load,
-                    min_load=plan_req.min_load,
-                    off_weeks=plan_req.off_weeks,
-                    off_days=plan_req.off_days,
-                    weekly_cycle=weekly_cycle_vals,
-                    owner_id=user.id)
-    db.session.add(ppplan)
-    db.session.delete(job)
-    db.session.commit()
-
-    approx_quality = u.approximation_quality(perf_after_plan, plan_req.goal)
-    send_email(user.email,
-               'perpot plan generation done',
-               '/training/email/plangen_done_email',
-               user=user,
-               model='PerPot',
-               approx_quality=approx_quality,
-               below_threshold=solution_fitness[1],
-               plan=ppplan)
-    return
+@celeryapp.task()
+def pp_genplan_gradient_task(user_id, plan_req):
+    _genplan_job('pp_genplan_gradient_task', user_id, plan_req, pp_model,
+                 _gradient_genplan)
 
 
 class PlanRequest():
@@ -733,3 +320,283 @@ def _fitting_data(mf, load_metric, perf_metric):
         plan = plan_since_min_p
         perfs = perfs_since_min_p
     return plan, perfs, min_p, plan_since_min_p
+
+
+def _genplan_job(task_name, user_id, plan_req, model, planner):
+    '''the plan generation job of a task: check the user, run the planner
+    after the prequel plan, store the plan and email the user. the planner
+    is called with the plan request, the training days, the model, the
+    prequel state, the model parameters and the warm start seeds and returns
+    the plan and whether its search ran out of budget'''
+    is_ff = model is ff_model
+    job_type = JobType.ff_genplan if is_ff else JobType.pp_genplan
+    user = User.query.get(user_id)
+    if user is None:
+        print('{}(): no User with user_id {}'.format(task_name, user_id))
+        return
+    if user.has_pending_jobs(job_type):
+        print('{}(): User {} has already pending job '
+              'of type {}'.format(task_name, user_id, job_type.name))
+        return
+    if plan_req.model_parms is None:
+        print('{}(): User {} has no {}_parameters'.
+              format(task_name, user_id, 'ff' if is_ff else 'pp'))
+        return
+
+    job = PendingJob(owner_id=user_id, job_type=job_type)
+    db.session.add(job)
+    db.session.commit()
+
+    model_args = plan_req.model_parms.to_dict()
+    if is_ff:
+        prequel_plan = \
+            plan_req.model_parms.plan_since_initial_p_till_next_monday()
+    else:
+        prequel_plan = \
+            plan_req.model_parms.plan_since_initial_pp_till_next_monday()
+    print('{}(): prequel_plan till monday {}'.format(task_name, prequel_plan))
+    training_days = u.microcycle_days(plan_req.weekly_cycle,
+                                      plan_req.length)
+    training_days = u.filter_weeks(training_days, plan_req.off_weeks)
+    training_days = u.filter_days(training_days, plan_req.off_days)
+    prequel_state = model.prequel_state(prequel_plan, **model_args)
+
+    seeds = _warm_start_seeds(user.ff_plans if is_ff else user.pp_plans,
+                              plan_req,
+                              training_days,
+                              model)
+    try:
+        solution, budget_limited = planner(plan_req,
+                                           training_days,
+                                           model,
+                                           prequel_state,
+                                           model_args,
+                                           seeds)
+    except:
+        print('{}(): {}'.format(task_name, sys.exc_info()))
+        db.session.delete(job)
+        db.session.commit()
+        return
+    solution = list(solution)
+    solution_fitness = u.fitness(prequel_plan + solution,
+                                 plan_req.goal,
+                                 GOOD_ENOUGH_THRES,
+                                 model.after_plan,
+                                 **model_args)
+    perf_after_plan = model.after_plan(prequel_plan + solution, **model_args)
+    u.print_ea_result(solution,
+                      solution_fitness,
+                      perf_after_plan,
+                      plan_req.goal)
+
+    weekly_cycle_vals = list(map(lambda d: d.value, plan_req.weekly_cycle))
+    if is_ff:
+        plan_class, model_fields = FFPlan, ff_model.PARAMETERS
+    else:
+        plan_class = PPPlan
+        model_fields = pp_model.PARAMETERS + ('load_scale_factor',
+                                              'perf_scale_factor')
+    plan = plan_class(name=plan_req.name,
+                      start_date=plan_req.start_date,
+                      start_perf=plan_req.start_perf,
+                      end_perf=perf_after_plan,
+                      loads=solution,
+                      load_metric=plan_req.model_parms.load_metric,
+                      perf_metric=plan_req.model_parms.perf_metric,
+                      prequel_plan=prequel_plan,
+                      goal=plan_req.goal,
+                      length=plan_req.length,
+                      max_load=plan_req.max_load,
+                      min_load=plan_req.min_load,
+                      off_weeks=plan_req.off_weeks,
+                      off_days=plan_req.off_days,
+                      weekly_cycle=weekly_cycle_vals,
+                      budget_limited=budget_limited,
+                      owner_id=user.id,
+                      **{k: getattr(plan_req.model_parms, k)
+                         for k in model_fields})
+    db.session.add(plan)
+    db.session.delete(job)
+    db.session.commit()
+
+    approx_quality = u.approximation_quality(perf_after_plan, plan_req.goal)
+    send_email(user.email,
+               '{} plan generation done'.format(
+                   'fitness fatigue' if is_ff else 'perpot'),
+               '/training/email/plangen_done_email',
+               user=user,
+               model='Fitness Fatigue' if is_ff else 'PerPot',
+               approx_quality=approx_quality,
+               below_threshold=solution_fitness[1],
+               plan=plan)
+    return
+
+
+def _de_genplan(plan_req,
+                training_days,
+                model,
+                prequel_state,
+                model_args,
+                seeds=None):
+    '''differential evolution planning, either as parallel restarts with
+    different pop_init_divisors or as an island model if DE_ISLANDS is set.
+    returns the plan and whether its search ran out of budget'''
+    strategy_setting = 'FF_DE_STRATEGY' if model is ff_model \
+        else 'PP_DE_STRATEGY'
+    args = (plan_req.length,
+            plan_req.goal,
+            training_days,
+            POP_SIZE,
+            plan_req.max_load,
+            plan_req.min_load,
+            model)
+    kwargs = dict(model_args,
+                  prequel_state=prequel_state,
+                  pp_func=u.sort_loads,
+                  recomb_weight=0.7,
+                  scale_factor=None,    # dither
+                  seeds=seeds,
+                  strategy=current_app.config.get(strategy_setting, 'rand'),
+                  surrogate_fraction=current_app.config.get(
+                      'DE_SURROGATE_FRACTION'),
+                  **_plan_budget())
+    islands = current_app.config.get('DE_ISLANDS', 0)
+    if islands > 1:
+        solution, stats = island_differential_evolution(
+            islands,
+            *args,
+            migration_interval=current_app.config['DE_MIGRATION_INTERVAL'],
+            migrants=current_app.config['DE_MIGRANTS'],
+            topology=current_app.config['DE_MIGRATION_TOPOLOGY'],
+            **kwargs)
+    else:
+        # the restarts run in parallel, the first good enough one wins
+        solution, stats = parallel_restarts([10, 6, 3, 1], *args, **kwargs)
+    return solution, stats['budget_limited']
+
+
+def _cmaes_genplan(plan_req,
+                   training_days,
+                   model,
+                   prequel_state,
+                   model_args,
+                   seeds=None):
+    '''CMA-ES planning from the most similar seed, as concurrent ipop or bipop
+    restarts if CMAES_RESTARTS is set. returns the plan and whether its
+    search ran out of budget'''
+    args = (plan_req.length,
+            plan_req.goal,
+            training_days,
+            plan_req.max_load,
+            model)
+    kwargs = dict(model_args,
+                  prequel_state=prequel_state,
+                  pp_func=u.sort_loads,
+                  seed=seeds[0] if seeds else None,
+                  **_plan_budget())
+    restarts = current_app.config.get('CMAES_RESTARTS', 0)
+    if restarts > 1:
+        solution, stats = genplan_restarts(
+            restarts,
+            current_app.config['CMAES_RESTART_REGIME'],
+            *args,
+            **kwargs)
+    else:
+        stats = {}
+        solution = cmaes_genplan(*args,
+                                 stats=stats,
+                                 processes=current_app.config.get(
+                                     'CMAES_PROCESSES'),
+                                 **kwargs)
+    return solution, stats['budget_limited']
+
+
+def _lp_genplan(plan_req,
+                training_days,
+                model,
+                prequel_state,
+                model_args,
+                seeds=None):
+    '''linear programming planning, exact and fast, so never budget limited.
+    the seeds are not needed'''
+    # ascending loads are what sort_loads produces, so the repair is a no-op
+    solution = lp_genplan(plan_req.length,
+                          plan_req.goal,
+                          training_days,
+                          plan_req.max_load,
+                          plan_req.min_load,
+                          model,
+                          prequel_state,
+                          pp_func=u.sort_loads,
+                          ascending=True,
+                          **model_args)
+    return solution, False
+
+
+def _gradient_genplan(plan_req,
+                      training_days,
+                      model,
+                      prequel_state,
+                      model_args,
+                      seeds=None):
+    '''perpot planning with L-BFGS-B and exact gradients from the most
+    similar seed. it converges quickly, so it is never budget limited'''
+    # sort_loads would change the performance the plan was optimized for
+    solution = gradient_genplan(plan_req.length,
+                                plan_req.goal,
+                                training_days,
+                                plan_req.max_load,
+                                plan_req.min_load,
+                                prequel_state,
+                                seed=seeds[0] if seeds else None,
+                                **model_args)
+    return solution, False
+
+
+def _previous_parameters(parms, parameters_class, load_metric, perf_metric):
+    '''the parameter dict a refit starts from: the user's parms if they were
+    fitted with the same metrics, otherwise the median of everyone's
+    parameters for these metrics. None if there are none'''
+    if parms is not None and parms.load_metric == load_metric and \
+            parms.perf_metric == perf_metric:
+        return parms.to_dict()
+    others = parameters_class.query.filter_by(load_metric=load_metric,
+                                              perf_metric=perf_metric).all()
+    return median_parameters([o.to_dict() for o in others])
+
+
+def _plan_budget():
+    '''the time and evaluation budget of a plan generation job'''
+    return {'time_budget': current_app.config.get('PLAN_TIME_BUDGET'),
+            'max_evaluations': current_app.config.get('PLAN_MAX_EVALUATIONS')}
+
+
+def _warm_start_seeds(stored_plans, plan_req, training_days, model):
+    '''the user's stored plans most similar to the plan request, adapted to
+    its length and training days'''
+    n = current_app.config.get('WARM_START_SEEDS', 0)
+    parms = plan_req.model_parms
+    if n <= 0 or plan_req.start_perf <= 0.0:
+        return []
+    weekly_cycle = [d.value for d in plan_req.weekly_cycle]
+    distances = []
+    for plan in stored_plans:
+        if (plan.load_metric != parms.load_metric or
+                plan.perf_metric != parms.perf_metric or
+                plan.start_perf <= 0.0):
+            continue
+        d = u.plan_distance(parms.to_dict(),
+                            {k: getattr(plan, k) for k in model.PARAMETERS},
+                            plan_req.length,
+                            plan.length,
+                            weekly_cycle,
+                            plan.weekly_cycle,
+                            plan_req.goal / plan_req.start_perf,
+                            plan.goal / plan.start_perf)
+        distances.append((d, plan.id, plan))
+    return [u.adapt_plan(plan.loads,
+                         plan_req.length,
+                         training_days,
+                         plan_req.max_load,
+                         plan_req.min_load)
+            for _, _, plan in sorted(distances)[:n]]
@@ -1,12 +1,15 @@
 import sys
 from flask import Markup, flash, redirect, url_for, render_template, request
+from flask import current_app
 from flask.ext.login import login_required, current_user
 from . import training
 from ..models import FFPlan, PPPlan, JobType, PLANS_LIMIT
 from .. import db
 from .tasks import PlanRequest
 from .tasks import ff_fitting_task, ff_genplan_task, ff_genplan_cmaes_task
+from .tasks import ff_genplan_lp_task
 from .tasks import pp_fitting_task, pp_genplan_task, pp_genplan_cmaes_task
+from .tasks import pp_genplan_gradient_task
 from .forms import StartFittingForm, GeneratePlanForm
 from .forms import DeletePlanForm, ShowPlanForm
 from .plan_util import WeekDays, parse_comma_separated_ints
@@ -51,9 +54,9 @@ def handle_fitting_request(jobtype, fitting_task, model_name):
             m = 'Sorry, this type of job is already pending for you.'
         else:
             if jobtype == JobType.ff_fitting:
-                algo = 'SLSQP'
+                algo = current_app.config['FF_FITTING_ALGO']
             else:
-                algo = 'LEAST_SQUARES'
+                algo = current_app.config['PP_FITTING_ALGO']
             load_metric = form.load_metric_choice.data
             perf_metric = form.perf_metric_choice.data
             fitting_task.delay(current_user.id, load_metric, perf_metric, algo)
@@ -152,8 +155,11 @@ def ff_genplan():
                                        off_weeks=off_weeks,
                                        off_days=off_day_indexes,
                                        weekly_cycle=parse_cycle_days(form))
-            ff_genplan_task.delay(current_user.id, plan_request)
-            # ff_genplan_cmaes_task.delay(current_user.id, plan_request)
+            ff_genplan_tasks = {'DE': ff_genplan_task,
+                                'CMA-ES': ff_genplan_cmaes_task,
+                                'LP': ff_genplan_lp_task}
+            planner = current_app.config['FF_PLANNER']
+            ff_genplan_tasks[planner].delay(current_user.id, plan_request)
             m = Markup('Fitness Fatigue plan generation has been started.<br>'
                        'Depending on server load, this can take a while.<br>'
                        'We\'ll mail you a notification when the job is done.')
@@ -230,8 +236,11 @@ def pp_genplan():
                                        off_days=off_day_indexes,
                                        weekly_cycle=parse_cycle_days(form))
 
-            pp_genplan_task.delay(current_user.id, plan_request)
-            # pp_genplan_cmaes_task.delay(current_user.id, plan_request)
+            pp_genplan_tasks = {'DE': pp_genplan_task,
+                                'CMA-ES': pp_genplan_cmaes_task,
+                                'GRADIENT': pp_genplan_gradient_task}
+            planner = current_app.config['PP_PLANNER']
+            pp_genplan_tasks[planner].delay(current_user.id, plan_request)
             m = Markup('PerPot plan generation has been started.<br>'
                        'Depending on server load, this can take a while.<br>'
                        'We\'ll mail you a notification when the job is done.')
@@ -1,11 +1,12 @@
 import magic
 from datetime import date
-from flask import render_template, redirect, url_for, flash
+from flask import render_template, redirect, url_for, flash, current_app
 from flask.ext.login import login_required
 from flask.ext.login import current_user
 from . import uploads
 from .. import db
 from ..models import GCMetricsFile
+from ..training.tasks import ff_fitting_task, pp_fitting_task
 from .forms import UploadGCMetricsFileForm
 
 
@@ -21,6 +22,22 @@ def allowed_mime(filecontent):
     return magic.from_buffer(filecontent, mime=True) == b'text/plain'
 
 
+def refit_parameters():
+    '''starts a warm started refit of the current user's model parameters
+    with their metrics. returns whether there were any'''
+    refits = [(current_user.ff_parameters.first(), ff_fitting_task),
+              (current_user.pp_parameters.first(), pp_fitting_task)]
+    refitted = False
+    for parms, fitting_task in refits:
+        if parms is not None:
+            fitting_task.delay(current_user.id,
+                               parms.load_metric,
+                               parms.perf_metric,
+                               'REFIT')
+            refitted = True
+    return refitted
+
+
 @uploads.route('/gc_metrics_file', methods=['GET', 'POST'])
 @login_required
 def gc_metrics_file():
@@ -49,8 +66,12 @@ def gc_metrics_file():
                 db.session.delete(of)
             db.session.add(f)
             db.session.commit()
-            flash(action + ' successfull. Now start your parameter fitting for '
-                  'the Fitness Fatigue or PerPot model.')
+            if current_app.config['REFIT_ON_UPLOAD'] and refit_parameters():
+                flash(action + ' successfull. Your model parameters are '
+                      'refitted to the new metrics file.')
+            else:
+                flash(action + ' successfull. Now start your parameter '
+                      'fitting for the Fitness Fatigue or PerPot model.')
             return redirect(url_for('main.index'))
         else:
             flash('Filetype not allowed.')
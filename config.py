@@ -15,6 +15,52 @@ class Config:
     CELERY_RESULT_BACKEND = 'amqp://'
     CELERYD_TASK_TIME_LIMIT = 60 * 60 * 24
 
+    # 'LEAST_SQUARES', 'L-BFGS-B', 'TNC', 'SLSQP', 'CMA-ES', 'DE',
+    # 'PORTFOLIO' to run all of them in parallel processes and keep the best,
+    # or 'REFIT' to warm start from the user's last fit with the metrics or,
+    # without one, from the median of everyone's parameters
+    FF_FITTING_ALGO = 'SLSQP'
+    PP_FITTING_ALGO = 'LEAST_SQUARES'
+    # seconds until a portfolio fitting keeps the best of the finished ones
+    FITTING_TIME_BUDGET = 10 * 60
+    # refit the stored parameters when a new metrics file is uploaded, warm
+    # started and within this fraction around the previous parameters
+    REFIT_ON_UPLOAD = False
+    REFIT_TRUST_REGION = 0.25
+
+    # differential evolution planning: with more than one island the
+    # populations evolve in parallel processes and exchange their best plans
+    DE_ISLANDS = 0
+    DE_MIGRATION_INTERVAL = 10  # generations
+    DE_MIGRANTS = 2
+    DE_MIGRATION_TOPOLOGY = 'ring'  # or 'fully_connected', 'random'
+    # 'rand', or the self-adaptive 'jade' or 'shade'
+    FF_DE_STRATEGY = 'rand'
+    PP_DE_STRATEGY = 'rand'
+    # share of the trials simulated after a linear surrogate ranked them,
+    # None simulates all of them
+    DE_SURROGATE_FRACTION = None
+
+    # processes scoring each CMA-ES generation, None scores in the task
+    CMAES_PROCESSES = None
+    # with more than one restart, CMA-ES runs with growing ('ipop') or
+    # alternating large and small ('bipop') populations in parallel processes
+    CMAES_RESTARTS = 0
+    CMAES_RESTART_REGIME = 'bipop'
+
+    # fitness fatigue plans are generated with 'DE', 'CMA-ES' or 'LP'
+    FF_PLANNER = 'DE'
+    # perpot plans are generated with 'DE', 'CMA-ES' or 'GRADIENT'
+    PP_PLANNER = 'DE'
+
+    # plan generation returns its best plan so far when either runs out
+    PLAN_TIME_BUDGET = 60 * 60  # seconds, None means no limit
+    PLAN_MAX_EVALUATIONS = None
+
+    # number of the user's most similar stored plans seeding plan generation,
+    # 0 starts from scratch
+    WARM_START_SEEDS = 0
+
     # TODO change for production deployment
     MAIL_SERVER = 'localhost'
     MAIL_PORT = 25
@@ -0,0 +1,125 @@
+import unittest
+import numpy as np
+from app.training import cmaes_planning as cp
+from app.training import fitnessfatigue as ff
+from app.training import plan_util as u
+
+
+class CMAESPlanningTestCase(unittest.TestCase):
+
+    parms = {'initial_p': 250.0,
+             'k_1': 1.2,
+             'tau_1': 40.0,
+             'k_2': 1.5,
+             'tau_2': 10.0}
+
+    def test_objective_batch(self):
+        training_days = np.array([0, 2, 4, 7, 9, 11])
+        loads = np.random.uniform(0.0, 100.0, (5, len(training_days)))
+        plans = np.zeros((8, 14))
+        f = cp.objective_batch(loads, 300.0, ff, self.parms, training_days,
+                               plans, None, u.sort_loads)
+        self.assertTrue(f.shape == (5,))
+        for x, value in zip(loads, f):
+            single = cp.objective_f(list(x), 300.0, ff, self.parms,
+                                    training_days, 14, None, u.sort_loads)
+            self.assertTrue(abs(single - value) < 1e-9)
+
+    def test_genplan_telemetry(self):
+        days = [u.WeekDays.monday, u.WeekDays.wednesday, u.WeekDays.friday]
+        training_days = u.microcycle_days(days, 4)
+        stats = {}
+        telemetry = []
+        plan = cp.genplan(4, 260.0, training_days, 150.0, ff, None,
+                          u.sort_loads, max_evaluations=200, stats=stats,
+                          telemetry=telemetry, **self.parms)
+        self.assertTrue(len(plan) == 4 * 7)
+        for i, l in enumerate(plan):
+            if i not in training_days:
+                self.assertTrue(l == 0.0)
+            self.assertTrue(0.0 <= l <= 150.0)
+        self.assertTrue(stats['budget_limited'])
+        self.assertTrue(len(telemetry) > 1)
+        self.assertTrue(telemetry[-1]['evaluations'] == stats['evaluations'])
+        for record in telemetry:
+            self.assertTrue(record['best'] <= record['median'])
+
+    def test_restart_schedule(self):
+        schedule = cp.restart_schedule(4, 'ipop', 36, 30.0)
+        self.assertTrue([p for p, s in schedule] == [14, 28, 56, 112])
+        self.assertTrue(all(s == 30.0 for p, s in schedule))
+        schedule = cp.restart_schedule(5, 'bipop', 36, 30.0)
+        self.assertTrue([schedule[i][0] for i in [0, 2, 4]] == [14, 28, 56])
+        for popsize, sigma in schedule[1::2]:
+            self.assertTrue(2 <= popsize <= 14)
+            self.assertTrue(0.3 <= sigma <= 30.0)
+        self.assertRaises(ValueError, cp.restart_schedule, 2, 'x', 36, 30.0)
+
+    def test_genplan_restarts(self):
+        days = [u.WeekDays.monday, u.WeekDays.wednesday, u.WeekDays.friday]
+        training_days = u.microcycle_days(days, 4)
+        plan, stats = cp.genplan_restarts(3, 'bipop', 4, 260.0,
+                                          training_days, 150.0, ff,
+                                          prequel_state=None,
+                                          pp_func=u.sort_loads,
+                                          max_evaluations=300,
+                                          **self.parms)
+        self.assertTrue(len(plan) == 4 * 7)
+        self.assertTrue(stats['budget_limited'])
+        # every run stops after the generation which spent the budget
+        self.assertTrue(300 <= stats['evaluations'] <= 300 + 3 * 28)
+        objective = cp.objective_f([plan[d] for d in training_days], 260.0,
+                                   ff, self.parms, training_days, 28, None,
+                                   u.sort_loads)
+        self.assertTrue(abs(objective - stats['objective']) < 1e-9)
+
+    def test_genplan_minimize_budget(self):
+        days = [u.WeekDays.monday, u.WeekDays.wednesday, u.WeekDays.friday]
+        training_days = u.microcycle_days(days, 4)
+        stats = {}
+        optres = cp.genplan_minimize(4, 260.0, training_days, 150.0, ff,
+                                     None, u.sort_loads, time_budget=0.0,
+                                     stats=stats, **self.parms)
+        self.assertTrue(len(optres.x) == len(training_days))
+        self.assertTrue(stats['budget_limited'])
+        # only the initial guess was scored
+        self.assertTrue(stats['evaluations'] == 1)
+        self.assertTrue(list(optres.x) == [0.0] * len(training_days))
+        stats = {}
+        cp.genplan_minimize(4, 260.0, training_days, 150.0, ff, None,
+                            u.sort_loads, max_evaluations=50, stats=stats,
+                            **self.parms)
+        self.assertTrue(stats['budget_limited'])
+        self.assertTrue(stats['evaluations'] == 50)
+
+    def test_genplan_restarts_without_time(self):
+        days = [u.WeekDays.monday, u.WeekDays.wednesday, u.WeekDays.friday]
+        training_days = u.microcycle_days(days, 4)
+        plan, stats = cp.genplan_restarts(2, 'ipop', 4, 260.0,
+                                          training_days, 150.0, ff,
+                                          prequel_state=None,
+                                          pp_func=u.sort_loads,
+                                          time_budget=0,
+                                          **self.parms)
+        # no run started, the all zero plan is returned
+        self.assertTrue(plan == [0.0] * (4 * 7))
+        self.assertTrue(stats['budget_limited'])
+        self.assertTrue(stats['evaluations'] == 0)
+
+    def test_genplan_time_budget(self):
+        days = [u.WeekDays.monday, u.WeekDays.wednesday, u.WeekDays.friday]
+        training_days = u.microcycle_days(days, 4)
+        plans = []
+        for _ in range(2):
+            np.random.seed(7)
+            stats = {}
+            telemetry = []
+            plans.append(cp.genplan(4, 260.0, training_days, 150.0, ff, None,
+                                    u.sort_loads, time_budget=0.0,
+                                    stats=stats, telemetry=telemetry,
+                                    **self.parms))
+            # the deadline is checked after every generation
+            self.assertTrue(stats['budget_limited'])
+            self.assertTrue(len(telemetry) == 1)
+        # cma is seeded from numpy's random state
+        self.assertTrue(plans[0] == plans[1])
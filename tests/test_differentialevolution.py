@@ -1,30 +1,16 @@
 import unittest
+import numpy as np
 from app.training import differentialevolution as de
+from app.training import fitnessfatigue as ff
 
 
 class DifferentialEvolutionTestCase(unittest.TestCase):
 
-    def test_generate_individual(self):
-        off_days = list(range(3 * 7))
-        i = de.generate_individual(3, off_days, 1.0, 0.0, 1)
-        self.assertTrue(len(i) == 3 * 7)
-        self.assertTrue(list(i) == [0.0] * (3 * 7))
-
-        off_days = []
-        i = de.generate_individual(3, off_days, 100, 0.0, 1)
-        self.assertTrue(max(i) <= 100)
-        i = de.generate_individual(3, off_days, 100, 0.0, 2)
-        self.assertTrue(max(i) <= 100 / 2)
-        i = de.generate_individual(3, off_days, 100, 0.0, 4)
-        self.assertTrue(max(i) <= 100 / 4)
-        i = de.generate_individual(3, off_days, 100, 50, 4)
-        self.assertTrue(min(i) >=  50)
-        i = de.generate_individual(3, off_days, 100, 100, 4)
-        self.assertTrue(all([v == 100 for v in i]))
-        off_days = [1, 10, 15]
-        i = de.generate_individual(3, off_days, 100, 10, 4)
-        for d in off_days:
-            self.assertTrue(i[d] == 0.0)
+    parms = {'initial_p': 250.0,
+             'k_1': 1.2,
+             'tau_1': 40.0,
+             'k_2': 1.5,
+             'tau_2': 10.0}
 
     def test_de_operator(self):
         a = [100, 100, 200, 0, 50, 25, 0]
@@ -34,3 +20,157 @@ class DifferentialEvolutionTestCase(unittest.TestCase):
         m = de.de_operator(a, b, c, d, 200, 15, 0.7, 0.9)
         self.assertTrue(m[3] == 0.0)
         self.assertTrue(m[6] == 0.0)
+
+    def test_de_operator_population(self):
+        genes = de.genome_index([0, 1, 2, 7, 8, 9])
+        pop = de.to_calendar(de.generate_genomes(len(genes), 20, 150, 10, 1),
+                             genes,
+                             np.zeros((20, 14)))
+        trials = de.de_operator(pop, pop[::-1], pop, pop[::-1], 150, 10, 0.7,
+                                de.rand_scale_fac(20))
+        self.assertTrue(trials.shape == pop.shape)
+        self.assertTrue((trials[:, [3, 4, 5, 6, 10, 11, 12, 13]] == 0.0).all())
+        self.assertTrue(((trials == 0.0) | (trials >= 10)).all())
+        self.assertTrue((trials <= 150).all())
+
+    def test_random_distinct_indices(self):
+        indices = de.random_distinct_indices(10, 4)
+        self.assertTrue(indices.shape == (10, 4))
+        for row in indices:
+            self.assertTrue(len(set(row)) == 4)
+
+    def test_evaluation_counter(self):
+        stats = {}
+        history = []
+        plan = de.differential_evolution(2, 1000.0, [0, 2, 4, 7, 9, 11], 10,
+                                         150.0, 0.0, ff, stats=stats,
+                                         history=history, history_every=5,
+                                         pop_init_divisor=1, **self.parms)
+        self.assertTrue(len(plan) == 2 * 7)
+        # the initial population plus one trial per individual and generation
+        self.assertTrue(stats['evaluations'] ==
+                        10 * (stats['generations'] + 1))
+        self.assertTrue([h[0] for h in history] ==
+                        list(range(0, stats['generations'], 5)))
+        for generation, max_fitness, mean_fitness in history:
+            self.assertTrue(mean_fitness <= max_fitness)
+
+    def test_parallel_restarts(self):
+        plan, stats = de.parallel_restarts([10, 1], 2, 260.0,
+                                           [0, 2, 4, 7, 9, 11], 10, 150.0,
+                                           0.0, ff, **self.parms)
+        self.assertTrue(len(plan) == 2 * 7)
+        self.assertTrue(stats['good_enough'])
+        fitness = de.u.fitness(plan, 260.0, de.GOOD_ENOUGH_THRES,
+                               ff.after_plan, **self.parms)
+        self.assertTrue(abs(stats['fitness'] - fitness[0]) < 1e-9)
+
+    def test_island_differential_evolution(self):
+        for topology in de.MIGRATION_TOPOLOGIES:
+            plan, stats = de.island_differential_evolution(
+                3, 2, 1000.0, [0, 2, 4, 7, 9, 11], 10, 150.0, 0.0, ff,
+                migration_interval=2, topology=topology, **self.parms)
+            self.assertTrue(len(plan) == 2 * 7)
+            self.assertTrue(not stats['good_enough'])
+        plan, stats = de.island_differential_evolution(
+            3, 2, 260.0, [0, 2, 4, 7, 9, 11], 10, 150.0, 0.0, ff, **self.parms)
+        self.assertTrue(stats['good_enough'])
+
+    def test_budgets(self):
+        stats = {}
+        de.differential_evolution(2, 1000.0, [0, 2, 4, 7, 9, 11], 10, 150.0,
+                                  0.0, ff, stats=stats, max_evaluations=55,
+                                  **self.parms)
+        self.assertTrue(stats['budget_limited'])
+        self.assertTrue(stats['evaluations'] == 50)
+        stats = {}
+        plan = de.differential_evolution(2, 1000.0, [0, 2, 4, 7, 9, 11], 10,
+                                         150.0, 0.0, ff, stats=stats,
+                                         time_budget=0.0, **self.parms)
+        self.assertTrue(stats['budget_limited'])
+        self.assertTrue(stats['generations'] == 0)
+        self.assertTrue(len(plan) == 2 * 7)
+
+    def test_seeds(self):
+        seed = [0.0] * 14
+        stats = {}
+        plan = de.differential_evolution(2, 250.0, [0, 2, 4, 7, 9, 11], 10,
+                                         150.0, 1.0, ff, stats=stats,
+                                         seeds=[seed], max_evaluations=10,
+                                         **self.parms)
+        # no generation ran, the all zero seed is the fittest initial plan
+        self.assertTrue(stats['generations'] == 0)
+        self.assertTrue(list(plan) == seed)
+
+    def test_pp_func_moving_loads(self):
+        # roll moves loads to the next day, often an off-day
+        for pp_func in [lambda plan: np.roll(plan, 1), de.u.sort_loads]:
+            stats = {}
+            plan = de.differential_evolution(2, 1000.0, [0, 2, 4, 7, 9, 11],
+                                             10, 150.0, 0.0, ff, stats=stats,
+                                             pp_func=pp_func,
+                                             max_evaluations=100,
+                                             **self.parms)
+            fitness = de.u.fitness(plan, 1000.0, de.GOOD_ENOUGH_THRES,
+                                   ff.after_plan, **self.parms)
+            self.assertTrue(abs(stats['fitness'] - fitness[0]) < 1e-9)
+
+    def test_training_day_genome(self):
+        training_days = [9, 2, 4, 2]
+        genes = de.genome_index(training_days)
+        self.assertTrue(list(genes) == [2, 4, 9])
+        calendar = np.zeros((3, 14))
+        plans = de.to_calendar(np.ones((2, 3)), genes, calendar)
+        self.assertTrue(plans.shape == (2, 14))
+        self.assertTrue(list(plans.sum(axis=0).nonzero()[0]) == [2, 4, 9])
+        plan = de.differential_evolution(2, 260.0, training_days, 10, 150.0,
+                                         10.0, ff, **self.parms)
+        self.assertTrue(list(np.nonzero(plan)[0]) == [2, 4, 9])
+
+    def test_adaptive_strategies(self):
+        for strategy in ['jade', 'shade']:
+            stats = {}
+            plan = de.differential_evolution(2, 265.0, [0, 2, 4, 7, 9, 11],
+                                             10, 150.0, 0.0, ff, stats=stats,
+                                             strategy=strategy,
+                                             pop_init_divisor=1, **self.parms)
+            self.assertTrue(len(plan) == 2 * 7)
+            if stats['good_enough']:
+                self.assertTrue(stats['evaluations_to_threshold'] ==
+                                stats['evaluations'])
+            else:
+                self.assertTrue(stats['evaluations_to_threshold'] is None)
+        self.assertRaises(ValueError, de.differential_evolution, 2, 265.0,
+                          [0, 2], 10, 150.0, 0.0, ff, strategy='best',
+                          **self.parms)
+
+    def test_update_adaptive_memory(self):
+        memory_f = np.full(3, 0.5)
+        memory_cr = np.full(3, 0.5)
+        k = de.update_adaptive_memory('shade', memory_f, memory_cr, 2,
+                                      np.array([0.2, 0.8]),
+                                      np.array([0.1, 0.9]),
+                                      np.array([1.0, 3.0]))
+        self.assertTrue(k == 0)
+        self.assertTrue(abs(memory_f[2] - 0.49 / 0.65) < 1e-12)
+        self.assertTrue(abs(memory_cr[2] - 0.7) < 1e-12)
+        f, cr = de.sample_adaptive_parameters(memory_f, memory_cr, 50)
+        self.assertTrue(((0.0 < f) & (f <= 1.0)).all())
+        self.assertTrue(((0.0 <= cr) & (cr <= 1.0)).all())
+
+    def test_surrogate(self):
+        # the FF performance is linear in the loads, so is the surrogate
+        genomes = np.random.random((40, 6)) * 100
+        plans = np.zeros((40, 14))
+        plans[:, [0, 2, 4, 7, 9, 11]] = genomes
+        weights = de.fit_surrogate(genomes, ff.final(plans, self.parms))
+        self.assertTrue(np.allclose(de.surrogate_perfs(weights, genomes),
+                                    ff.final(plans, self.parms)))
+        stats = {}
+        de.differential_evolution(2, 1000.0, [0, 2, 4, 7, 9, 11], 10, 150.0,
+                                  0.0, ff, stats=stats, surrogate_fraction=0.3,
+                                  **self.parms)
+        self.assertTrue(stats['evaluations'] ==
+                        10 + 3 * stats['generations'])
+        self.assertTrue(stats['surrogate_skipped'] ==
+                        7 * stats['generations'])
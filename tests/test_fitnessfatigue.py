@@ -0,0 +1,154 @@
+import unittest
+import numpy as np
+from app.training import fitnessfatigue as ff
+
+
+class FitnessFatigueTestCase(unittest.TestCase):
+
+    plan = [0.0, 0.0, 0.0, 0.0, 0.1, 0.1, 0.1,
+            0.9, 0.9, 0.9, 0.0, 0.9, 0.9, 0.0,
+            0.1, 0.1, 0.1, 0.1, 0.1, 0.1, 0.1,
+            0.0, 0.5, 0.0, 0.0, 0.3, 0.9, 0.0]
+    parms = {'initial_p': 0.2,
+             'k_1': 0.15,
+             'tau_1': 10.0,
+             'k_2': 0.13,
+             'tau_2': 6.0}
+
+    def reference_curve(self, plan):
+        w = ff.make_load_func(plan)
+        return [ff.discrete_p(n,
+                              self.parms['initial_p'],
+                              self.parms['tau_1'],
+                              self.parms['tau_2'],
+                              self.parms['k_1'],
+                              self.parms['k_2'],
+                              w) for n in range(1, len(plan) + 1)]
+
+    def test_decayed_loads(self):
+        w = ff.make_load_func(self.plan)
+        g = ff.decayed_loads(self.plan, 10.0)
+        expected = [ff.discrete_g(n, 10.0, w)
+                    for n in range(1, len(self.plan) + 1)]
+        self.assertTrue(len(g) == len(self.plan))
+        self.assertTrue(g[0] == 0.0)
+        self.assertTrue(np.allclose(g, expected))
+
+    def test_performance_over_time(self):
+        p = ff.performance_over_time(self.plan,
+                                     self.parms['initial_p'],
+                                     self.parms['k_1'],
+                                     self.parms['tau_1'],
+                                     self.parms['k_2'],
+                                     self.parms['tau_2'])
+        self.assertTrue(np.allclose(p, self.reference_curve(self.plan)))
+        parms = [self.parms['initial_p'], self.parms['k_1'],
+                 self.parms['tau_1'], self.parms['k_2'], self.parms['tau_2']]
+        p2 = ff.performance_over_time2(self.plan, parms)
+        self.assertTrue(np.allclose(p, p2))
+
+    def test_empty_plan(self):
+        self.assertTrue(len(ff.performance_over_time([], **self.parms)) == 0)
+        self.assertTrue(len(ff.decayed_loads([], self.parms['tau_1'])) == 0)
+
+    def test_after_plan(self):
+        expected = self.reference_curve(self.plan)[-1]
+        self.assertTrue(np.isclose(ff.after_plan(self.plan, **self.parms),
+                                   expected))
+        plans = [self.plan[:7], self.plan[:14], self.plan]
+        results = ff.discrete_p_curve_fit(plans,
+                                          self.parms['initial_p'],
+                                          self.parms['k_1'],
+                                          self.parms['tau_1'],
+                                          self.parms['k_2'],
+                                          self.parms['tau_2'])
+        for plan, result in zip(plans, results):
+            self.assertTrue(np.isclose(result, self.reference_curve(plan)[-1]))
+
+    def test_after_plan_batch(self):
+        plans = np.array([self.plan,
+                          list(reversed(self.plan)),
+                          [0.0] * len(self.plan)])
+        perfs, workloads = ff.after_plan_batch(plans, **self.parms)
+        for plan, perf, workload in zip(plans, perfs, workloads):
+            self.assertTrue(np.isclose(perf, ff.after_plan(plan, **self.parms)))
+            self.assertTrue(np.isclose(workload, sum(plan)))
+
+    def test_prequel_state(self):
+        prequel, plan = self.plan[:10], self.plan[10:]
+        state = ff.prequel_state(prequel, **self.parms)
+        expected = ff.after_plan(prequel + plan, **self.parms)
+        self.assertTrue(np.isclose(ff.after_plan_from_state(plan,
+                                                            state,
+                                                            **self.parms),
+                                   expected))
+        perfs, workloads = ff.after_plan_batch([plan, plan], state,
+                                               **self.parms)
+        self.assertTrue(np.allclose(perfs, expected))
+        self.assertTrue(np.allclose(workloads, sum(plan)))
+        state = ff.prequel_state([], **self.parms)
+        self.assertTrue(np.isclose(ff.after_plan_from_state(plan,
+                                                            state,
+                                                            **self.parms),
+                                   ff.after_plan(plan, **self.parms)))
+
+    def test_long_plan(self):
+        np.random.seed(0)
+        plan = list(np.random.random(600))
+        p = ff.performance_over_time(plan,
+                                     self.parms['initial_p'],
+                                     self.parms['k_1'],
+                                     self.parms['tau_1'],
+                                     self.parms['k_2'],
+                                     self.parms['tau_2'])
+        self.assertTrue(np.allclose(p[-20:], self.reference_curve(plan)[-20:]))
+
+    def test_busso_performance_over_time(self):
+        p = ff.busso_performance_over_time(self.plan,
+                                           self.parms['initial_p'],
+                                           self.parms['k_1'],
+                                           self.parms['tau_1'],
+                                           0.0,
+                                           self.parms['tau_2'],
+                                           5.0)
+        g = ff.decayed_loads(self.plan, self.parms['tau_1'])
+        self.assertTrue(np.allclose(p, self.parms['initial_p'] +
+                                    self.parms['k_1'] * g))
+        p2 = ff.busso_performance_over_time(self.plan,
+                                            self.parms['initial_p'],
+                                            self.parms['k_1'],
+                                            self.parms['tau_1'],
+                                            0.1,
+                                            self.parms['tau_2'],
+                                            5.0)
+        self.assertTrue(all(p2 <= p))
+
+    def test_performance_over_time_with_jacobian(self):
+        parms = np.array([self.parms['initial_p'], self.parms['k_1'],
+                          self.parms['tau_1'], self.parms['k_2'],
+                          self.parms['tau_2']])
+        p, jac = ff.performance_over_time_with_jacobian(self.plan, parms)
+        self.assertTrue(np.allclose(p, ff.performance_over_time2(self.plan,
+                                                                 parms)))
+        self.assertTrue(jac.shape == (len(self.plan), 5))
+        eps = 1e-6
+        for i in range(5):
+            d = np.zeros(5)
+            d[i] = eps
+            fd = (ff.performance_over_time2(self.plan, parms + d) -
+                  ff.performance_over_time2(self.plan, parms - d)) / (2 * eps)
+            self.assertTrue(np.allclose(jac[:, i], fd, atol=1e-6))
+
+    def test_model_interface(self):
+        plans = np.array([self.plan, self.plan[::-1]])
+        curves = ff.simulate(plans, self.parms)
+        self.assertTrue(curves.shape == plans.shape)
+        for plan, curve in zip(plans, curves):
+            self.assertTrue(np.allclose(curve, ff.performance_over_time(
+                plan, **self.parms)))
+        self.assertTrue(np.allclose(ff.final(plans, self.parms),
+                                    curves[:, -1]))
+        p, jac = ff.simulate_with_jacobian(self.plan, self.parms)
+        self.assertTrue(np.allclose(p, curves[0]))
+        self.assertTrue(jac.shape == (len(self.plan),
+                                      len(ff.FITTED_PARAMETERS)))
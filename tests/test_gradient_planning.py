@@ -0,0 +1,33 @@
+import unittest
+from app.training import gradient_planning as gp
+from app.training import perpot as pp
+from app.training import plan_util as u
+
+
+class GradientPlanningTestCase(unittest.TestCase):
+
+    parms = {'strainpot': 0.0,
+             'responsepot': 0.0,
+             'perfpot': 0.2,
+             'straindelay': 4.0,
+             'responsedelay': 2.0,
+             'overflowdelay': 15.0}
+
+    def test_genplan(self):
+        prequel = [0.2, 0.0, 0.3, 0.0, 0.2, 0.0, 0.0] * 2
+        state = pp.prequel_state(prequel, **self.parms)
+        days = [u.WeekDays.monday, u.WeekDays.wednesday, u.WeekDays.friday]
+        training_days = u.microcycle_days(days, 6)
+        stats = {}
+        plan = gp.genplan(6, 0.5, training_days, 1.0, 0.05, state,
+                          stats=stats, **self.parms)
+        self.assertTrue(len(plan) == 6 * 7)
+        for i, l in enumerate(plan):
+            if i in training_days:
+                self.assertTrue(0.05 <= l <= 1.0)
+            else:
+                self.assertTrue(l == 0.0)
+        perf = pp.after_plan(prequel + list(plan), **self.parms)
+        self.assertTrue(abs(perf - 0.5) < 0.01)
+        objective = abs(0.5 - perf) + u.WORKLOAD_FACTOR * sum(plan)
+        self.assertTrue(abs(objective - stats['objective']) < 1e-9)
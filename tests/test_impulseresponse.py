@@ -0,0 +1,52 @@
+import unittest
+import numpy as np
+from app.training import impulseresponse as ir
+
+
+class ImpulseResponseTestCase(unittest.TestCase):
+
+    def test_exponential_kernel(self):
+        kernel = ir.exponential_kernel(4, 2.0)
+        self.assertTrue(kernel[0] == 0.0)
+        self.assertTrue(np.allclose(kernel[1:], np.exp(-np.arange(1, 4) / 2)))
+        kernel = ir.exponential_kernel(4, 2.0, delay=0)
+        self.assertTrue(kernel[0] == 1.0)
+        kernel = ir.truncated_exponential_kernel(6, 2.0, 3)
+        self.assertTrue(all(kernel[4:] == 0.0))
+        self.assertTrue(kernel[3] > 0.0)
+
+    def test_convolve_direct_and_fft(self):
+        np.random.seed(0)
+        n = ir.FFT_MIN_LENGTH * 2
+        loads = np.random.random((3, n))
+        kernel = ir.exponential_kernel(n, 20.0)
+        expected = [np.convolve(l, kernel)[:n] for l in loads]
+        self.assertTrue(np.allclose(ir.convolve(loads, kernel), expected))
+        self.assertTrue(np.allclose(ir.convolve(loads[0], kernel),
+                                    expected[0]))
+        short = loads[:, :10]
+        expected = [np.convolve(l, kernel)[:10] for l in short]
+        self.assertTrue(np.allclose(ir.convolve(short, kernel), expected))
+        self.assertTrue(np.allclose(ir.convolve(short[0], kernel[:3]),
+                                    np.convolve(short[0], kernel[:3])[:10]))
+
+    def test_final_response(self):
+        loads = [[1.0, 0.0, 2.0, 0.0], [0.0, 0.0, 0.0, 3.0]]
+        kernel = ir.exponential_kernel(4, 5.0)
+        responses = ir.final_response(loads, kernel)
+        self.assertTrue(np.allclose(responses,
+                                    ir.convolve(loads, kernel)[:, -1]))
+
+    def test_exponential_response(self):
+        np.random.seed(0)
+        loads = np.random.random((3, 40))
+        for delay in [0, 1, 2]:
+            kernel = ir.exponential_kernel(40, 7.0, delay)
+            self.assertTrue(np.allclose(ir.exponential_response(loads, 7.0,
+                                                                delay),
+                                        ir.convolve(loads, kernel)))
+        lags = np.arange(40, dtype=np.double)
+        self.assertTrue(np.allclose(
+            ir.lag_weighted_exponential_response(loads[0], 7.0),
+            ir.convolve(loads[0], lags * ir.exponential_kernel(40, 7.0))))
+        self.assertTrue(len(ir.exponential_response([], 7.0)) == 0)
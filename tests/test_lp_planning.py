@@ -0,0 +1,46 @@
+import unittest
+from app.training import lp_planning as lp
+from app.training import fitnessfatigue as ff
+from app.training import plan_util as u
+
+
+class LPPlanningTestCase(unittest.TestCase):
+
+    parms = {'initial_p': 250.0,
+             'k_1': 1.2,
+             'tau_1': 40.0,
+             'k_2': 1.5,
+             'tau_2': 10.0}
+
+    def test_genplan(self):
+        prequel = [50.0, 0.0, 60.0, 0.0, 70.0, 0.0, 0.0] * 4
+        state = ff.prequel_state(prequel, **self.parms)
+        goal = 1.05 * ff.after_plan(prequel, **self.parms)
+        days = [u.WeekDays.monday, u.WeekDays.wednesday, u.WeekDays.friday]
+        training_days = u.microcycle_days(days, 8)
+        training_days = u.filter_weeks(training_days, [3])
+        plan = lp.genplan(8, goal, training_days, 150.0, 10.0, ff, state,
+                          **self.parms)
+        self.assertTrue(len(plan) == 8 * 7)
+        for i, l in enumerate(plan):
+            if i in training_days:
+                self.assertTrue(10.0 - 1e-6 <= l <= 150.0 + 1e-6)
+            else:
+                self.assertTrue(l == 0.0)
+        fitness = u.fitness(prequel + list(plan), goal, 0.5, ff.after_plan,
+                            **self.parms)
+        self.assertTrue(fitness[1])
+
+    def test_genplan_ascending(self):
+        state = ff.prequel_state([], **self.parms)
+        training_days = list(range(0, 6 * 7, 2))
+        plan = lp.genplan(6, 1.1 * self.parms['initial_p'], training_days,
+                          150.0, 0.0, ff, state, ascending=True, **self.parms)
+        loads = [plan[i] for i in training_days]
+        self.assertTrue(all(a <= b + 1e-9 for a, b in zip(loads, loads[1:])))
+
+    def test_genplan_infeasible(self):
+        state = ff.prequel_state([], **self.parms)
+        training_days = list(range(0, 2 * 7, 2))
+        self.assertRaises(ValueError, lp.genplan, 2, 300.0, training_days,
+                          50.0, 100.0, ff, state, **self.parms)
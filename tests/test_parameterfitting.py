@@ -0,0 +1,87 @@
+import unittest
+import numpy as np
+from app.training import parameterfitting as pf
+from app.training import fitnessfatigue as ff
+from app.training import fitting_util as f_util
+
+
+class ParameterFittingTestCase(unittest.TestCase):
+
+    parms = {'initial_p': 300.0,
+             'k_1': 1.0,
+             'tau_1': 35.0,
+             'k_2': 1.8,
+             'tau_2': 8.0}
+
+    plan = [100.0, 0.0, 120.0, 0.0, 80.0, 150.0, 0.0] * 12
+
+    def perfs(self):
+        perfs = ff.performance_over_time(self.plan, **self.parms)
+        # measured every third day
+        return [p if i % 3 == 0 else 0.0 for i, p in enumerate(perfs)]
+
+    def test_fitting_problem(self):
+        perfs = self.perfs()
+        problem = pf.FittingProblem(ff, self.plan, perfs)
+        model_perfs = ff.performance_over_time(self.plan, 290.0, 1.1, 30.0,
+                                               1.5, 10.0)
+        expected = f_util.calc_rmse(
+            [p for p in perfs if p > 0.0],
+            f_util.filter_model_perfs_2_real_perfs(model_perfs, perfs))
+        x = [290.0, 1.1, 30.0, 1.5, 10.0]
+        self.assertTrue(np.isclose(problem.rmse(pf.unpack_ff_parms_list(x)),
+                                   expected))
+        args = (problem, f_util.calc_rmse, pf.unpack_ff_parms_list)
+        self.assertTrue(np.isclose(pf.objective_f(x, *args), expected))
+        self.assertTrue(np.isclose(pf.rmse_and_gradient(x, *args)[0],
+                                   expected))
+
+    def test_ff_lmfit_fitting(self):
+        fitted, rmse = pf.ff_lmfit_fitting(self.plan, self.perfs())
+        self.assertTrue(rmse < 1e-3)
+        self.assertTrue(abs(fitted[2] - self.parms['tau_1']) < 0.1)
+
+    def test_portfolio_fitting(self):
+        algos = ['LEAST_SQUARES', 'L-BFGS-B', 'SLSQP']
+        algo, result, report = pf.portfolio_fitting(pf.ff_fitting,
+                                                    self.plan,
+                                                    self.perfs(),
+                                                    algos=algos,
+                                                    time_budget=60)
+        self.assertTrue(sorted(report) == sorted(algos))
+        self.assertTrue(report[algo]['rmse'] ==
+                        min(r['rmse'] for r in report.values()))
+        self.assertTrue(result[1] == report[algo]['rmse'])
+        self.assertTrue(len(result[0]) == 5)
+
+    def test_trust_region_bounds(self):
+        bounds = pf.trust_region_bounds([100.0, 1.0, 60.0],
+                                        [(0, 500), (0.01, 5), (1, 70)],
+                                        0.25,
+                                        free=[0])
+        self.assertTrue(bounds == [(0, 500), (0.75, 1.25), (45.0, 70)])
+
+    def test_ff_refit(self):
+        previous = {'initial_p': 290.0,
+                    'k_1': 1.1,
+                    'tau_1': 33.0,
+                    'k_2': 1.9,
+                    'tau_2': 8.5}
+        fitted, rmse = pf.ff_refit(self.plan, self.perfs(), previous, 0.25)
+        self.assertTrue(rmse < 0.5)
+        for p, v in zip(ff.FITTED_PARAMETERS[1:], fitted[1:]):
+            self.assertTrue(abs(v - previous[p]) <= 0.25 * previous[p])
+        fitted, rmse = pf.ff_refit(self.plan, self.perfs(), None, 0.25)
+        self.assertTrue(len(fitted) == 5)
+
+    def test_median_parameters(self):
+        others = [{'k_1': 1.0, 'tau_1': 30.0},
+                  {'k_1': 2.0, 'tau_1': 50.0},
+                  {'k_1': 1.2, 'tau_1': 35.0}]
+        self.assertTrue(pf.median_parameters(others) ==
+                        {'k_1': 1.2, 'tau_1': 35.0})
+        self.assertTrue(pf.median_parameters([]) is None)
+        # a user without a fit of their own is refitted from the median
+        median = pf.median_parameters([self.parms, self.parms])
+        fitted, rmse = pf.ff_refit(self.plan, self.perfs(), median, 0.25)
+        self.assertTrue(rmse < 0.5)
@@ -1,4 +1,5 @@
 import unittest
+import numpy as np
 from app.training import perpot as pp
 
 
@@ -11,3 +12,131 @@ class PerPotTestCase(unittest.TestCase):
     def test_calc_pp_perf_scale_factor(self):
         values = [10, 20, 30, 15, 5]
         self.assertTrue(pp.calc_pp_perf_scale_factor(values) == 1/45)
+
+    def test_after_plan_batch(self):
+        parms = {'strainpot': 0.0,
+                 'responsepot': 0.0,
+                 'perfpot': 0.2,
+                 'straindelay': 3.0,
+                 'responsedelay': 6.0,
+                 'overflowdelay': 1.5}
+        plans = [[0.0, 0.1, 0.1, 0.0, 0.5, 0.1, 0.0],
+                 [1.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0]]
+        perfs, workloads = pp.after_plan_batch(plans, **parms)
+        for plan, perf, workload in zip(plans, perfs, workloads):
+            self.assertTrue(perf == pp.after_plan(plan, **parms))
+            self.assertTrue(workload == sum(plan))
+
+    def test_prequel_state(self):
+        parms = {'strainpot': 0.0,
+                 'responsepot': 0.0,
+                 'perfpot': 0.2,
+                 'straindelay': 3.0,
+                 'responsedelay': 6.0,
+                 'overflowdelay': 1.5}
+        prequel = [0.0, 0.3, 0.1, 0.0, 0.9, 0.1, 0.0]
+        plan = [0.2, 0.1, 0.1, 0.0, 0.5, 0.1, 0.0]
+        state = pp.prequel_state(prequel, **parms)
+        expected = pp.after_plan(prequel + plan, **parms)
+        self.assertTrue(pp.after_plan_from_state(plan, state, **parms) ==
+                        expected)
+        perfs, _ = pp.after_plan_batch([plan], state, **parms)
+        self.assertTrue(perfs[0] == expected)
+
+    def test_performance_over_time_batch(self):
+        plans = [[0.0, 0.1, 0.1, 0.0, 0.5, 0.1, 0.0, 0.9, 0.0, 0.3],
+                 [1.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
+                 [0.3, 0.3, 0.3, 0.3, 0.3, 0.3, 0.3, 0.3, 0.3, 0.3]]
+        straindelays = [3.0, 4.0, 0.5]
+        responsedelays = [6.0, 2.0, 1.0]
+        overflowdelays = [1.5, 0.0, 15.0]
+        perfpots = pp.performance_over_time_batch(plans,
+                                                  0.0,
+                                                  0.1,
+                                                  0.2,
+                                                  straindelays,
+                                                  responsedelays,
+                                                  overflowdelays)
+        self.assertTrue(perfpots.shape == (3, 3, 10))
+        for i, plan in enumerate(plans):
+            for j in range(3):
+                expected = pp.performance_over_time(plan,
+                                                    0.0,
+                                                    0.1,
+                                                    0.2,
+                                                    straindelays[j],
+                                                    responsedelays[j],
+                                                    overflowdelays[j])
+                self.assertTrue(list(perfpots[i, j]) == expected)
+
+    def test_performance_over_time_with_jacobian(self):
+        plan = [0.0, 0.1, 0.1, 0.0, 0.5, 0.1, 0.0, 0.9, 0.0, 0.3,
+                0.6, 0.6, 0.0, 0.0, 0.2, 0.2, 0.2, 0.0, 0.0, 0.0]
+        parms = [0.0, 0.0, 0.2, 3.0, 6.0, 1.5]
+        perfpots, jac = pp.performance_over_time_with_jacobian(plan, parms)
+        self.assertTrue(list(perfpots) == pp.performance_over_time2(plan,
+                                                                    parms))
+        self.assertTrue(jac.shape == (len(plan), 4))
+        eps = 1e-7
+        for i in range(4):
+            up = list(parms)
+            down = list(parms)
+            up[i + 2] += eps
+            down[i + 2] -= eps
+            fd = (np.array(pp.performance_over_time2(plan, up)) -
+                  np.array(pp.performance_over_time2(plan, down))) / (2 * eps)
+            self.assertTrue(np.allclose(jac[:, i], fd, atol=1e-6))
+
+    def test_model_interface(self):
+        parms = {'strainpot': 0.0,
+                 'responsepot': 0.0,
+                 'perfpot': 0.2,
+                 'straindelay': 3.0,
+                 'responsedelay': 6.0,
+                 'overflowdelay': 1.5}
+        plans = [[0.0, 0.1, 0.1, 0.0, 0.5, 0.1, 0.0],
+                 [1.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0]]
+        curves = pp.simulate(plans, parms)
+        for plan, curve in zip(plans, curves):
+            self.assertTrue(list(curve) ==
+                            pp.performance_over_time(plan, **parms))
+        self.assertTrue(list(pp.final(plans, parms)) == list(curves[:, -1]))
+        # a single plan runs the scalar loop instead of the batch kernel
+        for plan, curve in zip(plans, curves):
+            self.assertTrue(pp.simulate([plan], parms).shape == (1, 7))
+            self.assertTrue(np.allclose(pp.simulate([plan], parms)[0], curve))
+            self.assertTrue(np.allclose(pp.final(plan, parms), curve[-1]))
+        state = pp.prequel_state(plans[1], **parms)
+        self.assertTrue(np.allclose(pp.final([plans[0]], parms, state),
+                                    pp.final(plans, parms, state)[0]))
+        perfpots, jac = pp.simulate_with_jacobian(plans[0], parms)
+        self.assertTrue(np.allclose(perfpots, curves[0]))
+        self.assertTrue(jac.shape == (len(plans[0]),
+                                      len(pp.FITTED_PARAMETERS)))
+
+    def test_after_plan_with_load_gradient(self):
+        plan = np.array([0.0, 0.1, 0.1, 0.0, 0.5, 0.1, 0.0, 0.9, 0.0, 0.3,
+                         0.6, 0.6, 0.0, 0.0, 0.2, 0.2, 0.2, 0.0, 0.0, 0.0])
+        parms = {'strainpot': 0.0,
+                 'responsepot': 0.0,
+                 'perfpot': 0.2,
+                 'straindelay': 3.0,
+                 'responsedelay': 6.0,
+                 'overflowdelay': 1.5}
+        perf, _ = pp.after_plan_with_load_gradient(plan, 0.0, **parms)
+        self.assertTrue(abs(perf - pp.after_plan(list(plan), **parms)) <
+                        1e-12)
+        eps = 1e-7
+        for smoothing in [0.0, 0.05]:
+            _, gradient = pp.after_plan_with_load_gradient(plan, smoothing,
+                                                           **parms)
+            for day in range(len(plan)):
+                up = plan.copy()
+                down = plan.copy()
+                up[day] += eps
+                down[day] -= eps
+                fd = (pp.after_plan_with_load_gradient(up, smoothing,
+                                                       **parms)[0] -
+                      pp.after_plan_with_load_gradient(down, smoothing,
+                                                       **parms)[0]) / (2 * eps)
+                self.assertTrue(abs(gradient[day] - fd) < 1e-6)
@@ -176,3 +176,26 @@ class PlanUtilTestCase(unittest.TestCase):
         pairs = [(3, 0), (4, 0), (5, 0), (6, 0), (0, 7)]
         v = p_util.standard_deviation_of_diffs(pairs)
         self.assertTrue(v == sqrt(2.0))
+
+    def test_adapt_plan(self):
+        loads = [10, 0, 20, 0, 30, 0, 0,
+                 40, 0, 50, 0, 60, 0, 0]
+        training_days = [0, 1, 2, 7, 8, 9, 14, 15, 16, 21, 22, 23]
+        plan = p_util.adapt_plan(loads, 4, training_days, 45, 15)
+        self.assertTrue(len(plan) == 4 * 7)
+        self.assertTrue(list(plan[:3]) == [15, 20, 20])
+        self.assertTrue(list(plan[21:24]) == [40, 45, 45])
+        for i, l in enumerate(plan):
+            if i not in training_days:
+                self.assertTrue(l == 0.0)
+
+    def test_plan_distance(self):
+        parms = {'a': 1.0, 'b': 2.0}
+        d = p_util.plan_distance(parms, parms, 4, 4, [0, 2], [2, 0], 1.1, 1.1)
+        self.assertTrue(d == 0.0)
+        d1 = p_util.plan_distance(parms, parms, 4, 8, [0, 2], [0, 2], 1.1, 1.1)
+        d2 = p_util.plan_distance(parms, parms, 4, 5, [0, 2], [0, 2], 1.1, 1.1)
+        self.assertTrue(d1 > d2 > 0.0)
+        d = p_util.plan_distance(parms, {'a': 1.0, 'b': 4.0}, 4, 4, [0], [1],
+                                 1.1, 1.2)
+        self.assertTrue(abs(d - (0.25 + 1.0 + 0.1)) < 1e-9)